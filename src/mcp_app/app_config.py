@@ -5,11 +5,15 @@ This module handles loading and managing application configuration.
 """
 
 import logging
+from pathlib import Path
 
 from mcp_app.config import Configuration, load_config_from_file
 
 logger = logging.getLogger(__name__)
 
+# Candidate config files, mounted config first
+CONFIG_PATHS = (Path("/data/config.toml"), Path("config.toml"))
+
 
 class AppConfig:
     """Handles application configuration loading and management."""
@@ -24,26 +28,21 @@ class AppConfig:
         return self._config
 
     def load_configuration(self) -> None:
-        """Load configuration from file."""
-        config_paths = ["/data/config.toml", "config.toml"]  # Check mounted config first
-
-        for config_path in config_paths:
+        """Load configuration from the first existing config file."""
+        for config_path in CONFIG_PATHS:
+            if not config_path.is_file():
+                continue
             try:
                 self._config = load_config_from_file(config_path)
                 logger.info("Configuration loaded successfully from %s.", config_path)
                 self.safe_log_config(self._config)
-                break
-            except FileNotFoundError:  # pragma: no cover
-                continue  # pragma: no cover
             except Exception:  # pragma: no cover
                 logger.exception("Failed to load config from %s", config_path)  # pragma: no cover
                 self._config = None  # pragma: no cover
-                break  # pragma: no cover
-        else:  # pragma: no cover
-            logger.error(
-                "No configuration file found in any of: %s", config_paths
-            )  # pragma: no cover
-            self._config = None  # pragma: no cover
+            break
+        else:
+            logger.error("No configuration file found in any of: %s", CONFIG_PATHS)
+            self._config = None
 
     def safe_log_config(self, config: Configuration | None) -> None:
         """Log configuration fields safely, avoiding sensitive data."""
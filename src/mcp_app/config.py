@@ -14,33 +14,37 @@ import os
 import re
 from datetime import timedelta  # noqa: TC003
 from pathlib import Path
+from typing import Literal
 
-try:
-    import tomllib  # pragma: no cover
-except ImportError:  # pragma: no cover
-    import tomli as tomllib  # pragma: no cover
-
-from pydantic import BaseModel
+import rtoml
+from pydantic import BaseModel, ConfigDict
 from pydantic_settings import BaseSettings
+from typing_extensions import TypedDict
 
 # --- Pydantic Models for Configuration ---
 
 
-class ServerTransportHTTPConfig(BaseModel):
+class ConfigModel(BaseModel):
+    """Base for configuration models, immutable once loaded since instances are cached."""
+
+    model_config = ConfigDict(frozen=True)
+
+
+class ServerTransportHTTPConfig(ConfigModel):
     """HTTP transport configuration."""
 
     host: str
     port: int = 8080
 
 
-class ServerTransportConfig(BaseModel):
+class ServerTransportConfig(ConfigModel):
     """Server transport configuration."""
 
     type: str
     http: ServerTransportHTTPConfig | None = None
 
 
-class ServerConfig(BaseModel):
+class ServerConfig(ConfigModel):
     """Server configuration."""
 
     name: str
@@ -48,20 +52,20 @@ class ServerConfig(BaseModel):
     transport: ServerTransportConfig | None = None
 
 
-class AccessLogsConfig(BaseModel):
+class AccessLogsConfig(ConfigModel):
     """Access logs middleware configuration."""
 
     excluded_headers: list[str] = []
     redacted_headers: list[str] = []
 
 
-class JWTValidationAllowCondition(BaseModel):
+class JWTValidationAllowCondition(TypedDict):
     """Condition for allowing JWT validation."""
 
     expression: str
 
 
-class JWTValidationLocalConfig(BaseModel):
+class JWTValidationLocalConfig(ConfigModel):
     """Local JWT validation configuration."""
 
     jwks_uri: str
@@ -71,22 +75,23 @@ class JWTValidationLocalConfig(BaseModel):
     audience: str | None = None
 
 
-class JWTValidationConfig(BaseModel):
+class JWTValidationConfig(ConfigModel):
     """JWT validation configuration."""
 
-    strategy: str
+    strategy: Literal["local", "external"]
+    # Deprecated and ignored; still accepted so existing config files keep loading
     forwarded_header: str | None = None
     local: JWTValidationLocalConfig | None = None
 
 
-class JWTConfig(BaseModel):
+class JWTConfig(ConfigModel):
     """JWT middleware configuration."""
 
     enabled: bool
     validation: JWTValidationConfig | None = None
 
 
-class CORSConfig(BaseModel):
+class CORSConfig(ConfigModel):
     """CORS middleware configuration."""
 
     allow_origins: list[str] = ["*"]
@@ -95,7 +100,7 @@ class CORSConfig(BaseModel):
     allow_headers: list[str] = ["*"]
 
 
-class MiddlewareConfig(BaseModel):
+class MiddlewareConfig(ConfigModel):
     """Middleware configuration."""
 
     access_logs: AccessLogsConfig
@@ -103,14 +108,14 @@ class MiddlewareConfig(BaseModel):
     jwt: JWTConfig | None = None
 
 
-class OAuthAuthorizationServer(BaseModel):
+class OAuthAuthorizationServer(ConfigModel):
     """OAuth authorization server configuration."""
 
     enabled: bool
     issuer_uri: str
 
 
-class OAuthProtectedResourceConfig(BaseModel):
+class OAuthProtectedResourceConfig(ConfigModel):
     """OAuth protected resource configuration."""
 
     enabled: bool
@@ -133,14 +138,14 @@ class OAuthProtectedResourceConfig(BaseModel):
 class AuthConfig(BaseSettings):
     """Auth configuration for OAuth flows."""
 
-    model_config = {"env_prefix": "MCP_"}
+    model_config = {"env_prefix": "MCP_", "frozen": True}
 
     client_id: str
     client_secret: str
     redirect_uri: str | None = None
 
 
-class Configuration(BaseModel):
+class Configuration(ConfigModel):
     """Top-level configuration model for the application."""
 
     server: ServerConfig | None = None
@@ -154,8 +159,37 @@ class Configuration(BaseModel):
 
 # --- Configuration Loading Function ---
 
+# Match ${VAR} or $VAR patterns
+_ENVVAR_RE = re.compile(r"\$\{([^}]+)\}|\$([A-Za-z_][A-Za-z0-9_]*)")
+
+# Only allow expansion of common, non-sensitive vars
+_ALLOWED_ENV_VARS = frozenset(
+    {
+        "HOME",
+        "USER",
+        "PATH",
+        "PWD",
+        "SHELL",
+        "LANG",
+        "LC_ALL",
+        "TMPDIR",
+        "TEMP",
+        "TMP",
+        "LOGNAME",
+        "USERNAME",
+    }
+)
+
+# Validated configurations keyed by (path, mtime_ns, size)
+_CONFIG_CACHE: dict[tuple[str, int, int], Configuration] = {}
+
+
+def clear_config_cache() -> None:
+    """Drop all cached configurations so the next load re-reads the file."""
+    _CONFIG_CACHE.clear()
 
-def safe_expandvars(content: str, allowed_vars: set[str] | None = None) -> str:
+
+def safe_expandvars(content: str, allowed_vars: set[str] | frozenset[str] | None = None) -> str:
     """
     Safely expand environment variables in content.
 
@@ -170,6 +204,8 @@ def safe_expandvars(content: str, allowed_vars: set[str] | None = None) -> str:
         The content with allowed variables expanded.
 
     """
+    if "$" not in content:
+        return content
 
     def replacer(match: re.Match[str]) -> str:
         var_name = match.group(1) or match.group(2)
@@ -180,9 +216,7 @@ def safe_expandvars(content: str, allowed_vars: set[str] | None = None) -> str:
             return match.group(0)  # Return original ${VAR} or $VAR unchanged
         return os.environ.get(var_name, match.group(0))
 
-    # Match ${VAR} or $VAR patterns
-    pattern = re.compile(r"\$\{([^}]+)\}|\$([A-Za-z_][A-Za-z0-9_]*)")
-    return pattern.sub(replacer, content)
+    return _ENVVAR_RE.sub(replacer, content)
 
 
 def load_config_from_file(filepath: str | Path) -> Configuration:
@@ -190,6 +224,8 @@ def load_config_from_file(filepath: str | Path) -> Configuration:
     Read a TOML configuration file.
 
     Expand environment variables and parse it into a Configuration object.
+    Results are cached by path, modification time and size, so loading an
+    unchanged file again skips parsing and validation.
 
         filepath: The path to the TOML configuration file.
 
@@ -203,23 +239,32 @@ def load_config_from_file(filepath: str | Path) -> Configuration:
         msg = f"Configuration file not found at: {filepath}"
         raise FileNotFoundError(msg)
 
-    raw_content = config_path.read_text(encoding="utf-8")
-    # Only allow expansion of common, non-sensitive vars
-    allowed_vars = {
-        "HOME",
-        "USER",
-        "PATH",
-        "PWD",
-        "SHELL",
-        "LANG",
-        "LC_ALL",
-        "TMPDIR",
-        "TEMP",
-        "TMP",
-        "LOGNAME",
-        "USERNAME",
-    }
-    expanded_content = safe_expandvars(raw_content, allowed_vars)
-    config_data = tomllib.loads(expanded_content)
+    stat = config_path.stat()
+    cache_key = (str(config_path), stat.st_mtime_ns, stat.st_size)
+    cached = _CONFIG_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    config = load_config_from_bytes(config_path.read_bytes())
+    _CONFIG_CACHE[cache_key] = config
+    return config
 
-    return Configuration.model_validate(config_data)
+
+def load_config_from_bytes(raw_bytes: bytes) -> Configuration:
+    """
+    Parse TOML configuration content.
+
+    Expand environment variables and parse it into a Configuration object.
+
+    Args:
+        raw_bytes: The UTF-8 encoded TOML content.
+
+    Returns:
+        A validated Configuration object.
+
+    """
+    # TOML parsers only take str, so decode once and expand only if needed
+    content = raw_bytes.decode("utf-8")
+    if b"$" in raw_bytes:
+        content = safe_expandvars(content, _ALLOWED_ENV_VARS)
+    return Configuration.model_validate(rtoml.loads(content))
@@ -6,23 +6,73 @@ middlewares and MCP tools in an async-safe way.
 """
 
 from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import Any
 
+# Claims always exposed, needed for authorization
+ALWAYS_EXPOSED_CLAIMS = frozenset({"permissions"})
+
 
 class JWTContextConfig:
     """Configuration for JWT context exposure."""
 
+    __slots__ = ("_allowed_claims", "_exposed_claims")
+
     def __init__(self) -> None:
         """Initialize the JWT context configuration."""
-        self.exposed_claims: str | list[str] = "all"
+        self._exposed_claims: str | list[str] = "all"
+        self._allowed_claims: frozenset[str] | None = None
+
+    @property
+    def exposed_claims(self) -> str | list[str]:
+        """Get the configured claims to expose."""
+        return self._exposed_claims
+
+    @exposed_claims.setter
+    def exposed_claims(self, claims: str | list[str]) -> None:
+        """Set the claims to expose and precompute the allowed claim set."""
+        self._exposed_claims = claims
+        # Anything other than a list (e.g. "all" or a misconfiguration) exposes all claims
+        self._allowed_claims = (
+            frozenset(claims) | ALWAYS_EXPOSED_CLAIMS if isinstance(claims, list) else None
+        )
+
+    @property
+    def allowed_claims(self) -> frozenset[str] | None:
+        """Get the precomputed set of exposed claims, or None to expose all."""
+        return self._allowed_claims
 
 
 # Singleton instance
 jwt_context_config = JWTContextConfig()
 
-# Context variables for JWT data
-jwt_token: ContextVar[str | None] = ContextVar("jwt_token", default=None)
-jwt_payload: ContextVar[dict[str, Any] | None] = ContextVar("jwt_payload", default=None)
+
+@dataclass(frozen=True, slots=True)
+class JWTState:
+    """Validated JWT token and its filtered payload."""
+
+    token: str | None = None
+    payload: dict[str, Any] | None = None
+    # Permissions claim as a set, built once so scope checks are constant time
+    permissions: frozenset[str] = field(init=False, default=frozenset())
+
+    def __post_init__(self) -> None:
+        """Build the permission set from the payload."""
+        object.__setattr__(self, "permissions", _permission_set(self.payload))
+
+
+def _permission_set(payload: dict[str, Any] | None) -> frozenset[str]:
+    """Get the permissions claim as a set, accepting a list or a space-separated string."""
+    permissions = payload.get("permissions") if payload else None
+    if isinstance(permissions, str):
+        return frozenset(permissions.split())
+    if isinstance(permissions, list | tuple):
+        return frozenset(p for p in permissions if isinstance(p, str))
+    return frozenset()
+
+
+# Single context variable for JWT data, so task spawns copy one entry
+jwt_state: ContextVar[JWTState | None] = ContextVar("jwt_state", default=None)
 
 
 def set_exposed_claims(claims: str | list[str]) -> None:
@@ -49,15 +99,10 @@ def filter_payload(payload: dict[str, Any]) -> dict[str, Any]:
         Filtered payload dictionary.
 
     """
-    # Always include permissions for authorization
-    always_include = {"permissions"}
-    if jwt_context_config.exposed_claims == "all":
+    allowed = jwt_context_config.allowed_claims
+    if allowed is None:
         return payload
-    if isinstance(jwt_context_config.exposed_claims, list):
-        exposed = set(jwt_context_config.exposed_claims) | always_include
-        return {k: v for k, v in payload.items() if k in exposed}
-    # Fallback to all if misconfigured
-    return payload
+    return {k: payload[k] for k in payload.keys() & allowed}
 
 
 def set_jwt_context(token: str, payload: dict[str, Any]) -> None:
@@ -69,8 +114,7 @@ def set_jwt_context(token: str, payload: dict[str, Any]) -> None:
         payload: The decoded JWT payload.
 
     """
-    jwt_token.set(token)
-    jwt_payload.set(filter_payload(payload))
+    jwt_state.set(JWTState(token, filter_payload(payload)))
 
 
 def get_jwt_payload() -> dict[str, Any] | None:
@@ -81,4 +125,17 @@ def get_jwt_payload() -> dict[str, Any] | None:
         The JWT payload as a dictionary, or None if not set or decoding failed.
 
     """
-    return jwt_payload.get()
+    state = jwt_state.get()
+    return state.payload if state else None
+
+
+def get_jwt_permissions() -> frozenset[str] | None:
+    """
+    Get the permissions granted by the JWT payload.
+
+    Returns:
+        The permissions as a set, or None if no JWT payload is available.
+
+    """
+    state = jwt_state.get()
+    return state.permissions if state and state.payload else None
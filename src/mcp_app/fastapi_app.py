@@ -4,6 +4,8 @@ FastAPI application setup for the MCP-Forge-Python service.
 This module handles FastAPI app configuration, middlewares, and endpoints.
 """
 
+import asyncio
+import json
 import logging
 from collections.abc import AsyncGenerator
 from contextlib import AsyncExitStack, asynccontextmanager
@@ -11,21 +13,109 @@ from typing import Any
 
 import httpx
 from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from mcp.server import FastMCP
+from pydantic import BaseModel
 
-from mcp_app.config import Configuration
+from mcp_app.config import AuthConfig, Configuration, JWTValidationLocalConfig
 from mcp_app.context import set_exposed_claims
 from mcp_app.handlers.handlers import HandlersManager
-from mcp_app.middlewares.access_logs import AccessLogsMiddleware
-from mcp_app.middlewares.jwt_validation import JWTValidationMiddleware
+from mcp_app.middlewares.access_logs import AccessLogsMiddleware, queued_access_logs
+from mcp_app.middlewares.cors import CORSMiddleware
+from mcp_app.middlewares.health import HEALTH_CHECK_BODY, HEALTH_CHECK_PATH, HealthCheckMiddleware
+from mcp_app.middlewares.jwt_validation import JWKSCache, JWTValidationMiddleware
 
 logger = logging.getLogger(__name__)
 
 # HTTP status constants
 HTTP_OK = 200
 
+# Served by the OAuth metadata endpoints when no configuration is loaded
+CONFIG_NOT_LOADED_BODY = b'{"error":"Configuration not loaded"}'
+
+# Maximum number of token exchanges in flight against the identity provider
+TOKEN_EXCHANGE_CONCURRENCY = 32
+
+# Page shown after a successful OAuth callback; only {jwt} is substituted
+CALLBACK_HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>JWT Token</title>
+    <style>
+        body {{
+            display: flex;
+            flex-direction: column;
+            justify-content: center;
+            align-items: center;
+            height: 100vh;
+            margin: 0;
+            font-family: Arial, sans-serif;
+            background-color: #f0f0f0;
+        }}
+        h1 {{
+            font-size: 2em;
+            margin-bottom: 20px;
+            color: #333;
+        }}
+        input {{
+            font-size: 1.2em;
+            padding: 10px;
+            width: 80%;
+            max-width: 600px;
+            text-align: center;
+            border: 2px solid #ccc;
+            border-radius: 5px;
+            cursor: pointer;
+        }}
+        p {{
+            font-size: 1em;
+            color: #666;
+            margin-top: 20px;
+        }}
+        #notification {{
+            display: none;
+            margin-top: 20px;
+            padding: 10px;
+            background-color: #4CAF50;
+            color: white;
+            border-radius: 5px;
+            font-size: 1em;
+        }}
+    </style>
+</head>
+<body>
+    <h1>Tu Token JWT</h1>
+    <input type="password" value="{jwt}" onclick="copyToClipboard(this.value)" readonly>
+    <p>Haz clic en el cuadro de texto para copiar el token al portapapeles</p>
+    <div id="notification">¡Token copiado al portapapeles!</div>
+    <script>
+        function copyToClipboard(text) {{
+            navigator.clipboard.writeText(text).then(function() {{
+                showNotification();
+            }}, function(err) {{
+                console.error('No se pudo copiar el texto: ', err);
+                alert('Error al copiar el token.');
+            }});
+        }}
+        function showNotification() {{
+            const notification = document.getElementById('notification');
+            notification.style.display = 'block';
+            setTimeout(function() {{
+                notification.style.display = 'none';
+            }}, 3000);
+        }}
+    </script>
+</body>
+</html>
+"""
+
+
+class TokenResponse(BaseModel):
+    """OAuth token endpoint response."""
+
+    access_token: str | None = None
+
 
 class FastAPIApp:
     """Handles FastAPI application setup and configuration."""
@@ -34,8 +124,58 @@ class FastAPIApp:
         """Initialize FastAPI app with config and MCP server."""
         self.config = config
         self.mcp = mcp
+        # Shared HTTP client, only available while the app lifespan is running
+        self._http_client: httpx.AsyncClient | None = None
+        # JWKS cache for local JWT validation, owned here so the lifespan can close its client
+        self._jwks_cache: JWKSCache | None = None
+        # Bounds token endpoint fan-out; callbacks for the same code share one exchange
+        self._token_semaphore = asyncio.Semaphore(TOKEN_EXCHANGE_CONCURRENCY)
+        self._token_exchanges: dict[str, asyncio.Future[httpx.Response]] = {}
+        # OAuth values only depend on config, so the endpoints just check if they are set;
+        # the login URL gets redirect_uri appended per request
+        local_config = self._resolve_local_jwt_config(config)
+        auth: AuthConfig | None = config.auth if config else None
+        self._authorize_url: str | None = None
+        self._token_url: str | None = None
+        self._token_form: dict[str, str] = {}
+        if local_config is not None and auth is not None:
+            issuer = local_config.issuer
+            self._authorize_url = (
+                f"{issuer}authorize?"
+                f"client_id={auth.client_id}&"
+                "response_type=code&"
+                "scope=openid profile email&"
+                f"audience={local_config.audience}&"
+                "redirect_uri="
+            )
+            self._token_url = f"{issuer}oauth/token"
+            self._token_form = {
+                "grant_type": "authorization_code",
+                "client_id": auth.client_id,
+                "client_secret": auth.client_secret,
+            }
+        # The root message only depends on config, so serialize it once
+        server_name = config.server.name if config and config.server else "Unknown"
+        self._root_body = json.dumps({"message": f"Hello from {server_name}"}).encode()
         self.app = self._create_app()
         self.handlers_manager = HandlersManager(config) if config else None
+        # Apply JWT exposed claims now; it is plain config and needs no running loop
+        if config:
+            set_exposed_claims(config.jwt_exposed_claims)
+
+    @staticmethod
+    def _resolve_local_jwt_config(
+        config: Configuration | None,
+    ) -> JWTValidationLocalConfig | None:
+        """Get the local JWT validation config, or None if any level is missing."""
+        if (
+            not config
+            or not config.middleware
+            or not config.middleware.jwt
+            or not config.middleware.jwt.validation
+        ):
+            return None
+        return config.middleware.jwt.validation.local or None
 
     def _create_app(self) -> FastAPI:
         """Create and configure the FastAPI application."""
@@ -52,6 +192,9 @@ class FastAPIApp:
         # Add other middlewares
         self._add_middlewares(app)
 
+        # Added last so it is outermost and health probes skip the other middlewares
+        app.add_middleware(HealthCheckMiddleware)
+
         # Add endpoints
         self._add_endpoints(app)
 
@@ -68,11 +211,17 @@ class FastAPIApp:
         _ = app  # Required by FastAPI lifespan signature
         async with AsyncExitStack() as stack:
             await stack.enter_async_context(self.mcp.session_manager.run())
-            # Set JWT exposed claims configuration if config is loaded
-            if self.config:
-                set_exposed_claims(self.config.jwt_exposed_claims)
+            stack.enter_context(queued_access_logs())
+            if self._jwks_cache is not None:
+                stack.push_async_callback(self._jwks_cache.aclose)
+            self._http_client = await stack.enter_async_context(httpx.AsyncClient(timeout=10.0))
+            if self.handlers_manager:
+                self.handlers_manager.http_client = self._http_client
 
             yield
+            self._http_client = None
+            if self.handlers_manager:
+                self.handlers_manager.http_client = None
 
         logger.info("Application shutting down.")
 
@@ -115,21 +264,21 @@ class FastAPIApp:
                 jwt_config = self.config.middleware.jwt
                 validation = jwt_config.validation
                 local_config = validation.local if validation else None
+                jwks_uri = local_config.jwks_uri if local_config else None
+                cache_interval = (
+                    int(local_config.cache_interval.total_seconds()) if local_config else 300
+                )
+                if jwks_uri:
+                    self._jwks_cache = JWKSCache(jwks_uri, cache_interval)
 
                 app.add_middleware(
                     JWTValidationMiddleware,
                     strategy=validation.strategy if validation else "external",
-                    forwarded_header=(
-                        validation.forwarded_header
-                        if validation and validation.forwarded_header
-                        else "X-Validated-Jwt"
-                    ),
-                    jwks_uri=local_config.jwks_uri if local_config else None,
-                    cache_interval=(
-                        int(local_config.cache_interval.total_seconds()) if local_config else 300
-                    ),
+                    jwks_uri=jwks_uri,
+                    cache_interval=cache_interval,
+                    jwks_cache=self._jwks_cache,
                     allow_conditions=[
-                        c.expression
+                        c["expression"]
                         for c in (local_config.allow_conditions if local_config else [])
                     ],
                     issuer=local_config.issuer if local_config else None,
@@ -138,53 +287,40 @@ class FastAPIApp:
 
     def _add_endpoints(self, app: FastAPI) -> None:
         """Add API endpoints to the app."""
-        app.get("/.well-known/oauth-authorization-server")(self._oauth_authorization_server)
+        app.get("/.well-known/oauth-authorization-server", response_model=None)(
+            self._oauth_authorization_server
+        )
         app.get("/.well-known/oauth-protected-resource")(self._oauth_protected_resource)
         app.get("/")(self._read_root)
         app.get("/login")(self._login)
         app.get("/callback", response_model=None)(self._callback)
-        app.get("/health")(self._health_check)
+        app.get(HEALTH_CHECK_PATH)(self._health_check)
 
-    async def _oauth_authorization_server(self) -> dict[str, Any]:
+    async def _oauth_authorization_server(self) -> dict[str, Any] | Response:
         """Handle OAuth authorization server metadata endpoint."""
-        if not self.handlers_manager:  # pragma: no cover
-            return {"error": "Configuration not loaded"}  # pragma: no cover
-        return await self.handlers_manager.handle_oauth_authorization_server()  # pragma: no cover
+        handlers_manager = self.handlers_manager
+        if not handlers_manager:
+            return Response(CONFIG_NOT_LOADED_BODY, media_type="application/json")
+        return await handlers_manager.handle_oauth_authorization_server()
 
-    async def _oauth_protected_resource(self) -> dict[str, Any]:
+    async def _oauth_protected_resource(self, request: Request) -> Response:
         """Handle OAuth protected resource metadata endpoint."""
-        if not self.handlers_manager:  # pragma: no cover
-            return {"error": "Configuration not loaded"}  # pragma: no cover
-        return await self.handlers_manager.handle_oauth_protected_resources()  # pragma: no cover
+        handlers_manager = self.handlers_manager
+        if not handlers_manager:
+            return Response(CONFIG_NOT_LOADED_BODY, media_type="application/json")
+        return await handlers_manager.handle_oauth_protected_resources(
+            request.headers.get("if-none-match")
+        )
 
-    async def _read_root(self) -> dict[str, str]:
+    async def _read_root(self) -> Response:
         """Root endpoint returning server information."""
-        server_name = (
-            self.config.server.name if self.config and self.config.server else "Unknown"
-        )  # pragma: no cover
-        return {"message": f"Hello from {server_name}"}  # pragma: no cover
+        return Response(self._root_body, media_type="application/json")
 
     async def _login(self, request: Request) -> Response:
         """Redirect to Auth0 login."""
-        if (
-            not self.config
-            or not self.config.auth
-            or not self.config.middleware
-            or not self.config.middleware.jwt
-            or not self.config.middleware.jwt.validation
-            or not self.config.middleware.jwt.validation.local
-        ):
+        if self._authorize_url is None:
             return JSONResponse(status_code=400, content={"error": "Config incomplete"})
-        local_config = self.config.middleware.jwt.validation.local
-        auth_url = (
-            f"{local_config.issuer}authorize?"
-            f"client_id={self.config.auth.client_id}&"
-            "response_type=code&"
-            f"redirect_uri={request.base_url}callback&"
-            "scope=openid profile email&"
-            f"audience={local_config.audience}"
-        )
-        return RedirectResponse(auth_url)
+        return RedirectResponse(f"{self._authorize_url}{request.base_url}callback")
 
     async def _callback(
         self,
@@ -202,105 +338,44 @@ class FastAPIApp:
         if not code:
             return JSONResponse({"error": "Missing authorization code"})
 
-        if (
-            not self.config
-            or not self.config.auth
-            or not self.config.middleware
-            or not self.config.middleware.jwt
-            or not self.config.middleware.jwt.validation
-            or not self.config.middleware.jwt.validation.local
-        ):
+        token_url = self._token_url
+        if token_url is None:
             return JSONResponse({"error": "Config incomplete"})
 
-        local_config = self.config.middleware.jwt.validation.local
-        token_url = f"{local_config.issuer}oauth/token"
         data = {
-            "grant_type": "authorization_code",
-            "client_id": self.config.auth.client_id,
-            "client_secret": self.config.auth.client_secret,
+            **self._token_form,
             "code": code,
             "redirect_uri": f"{request.base_url}callback",
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(token_url, data=data, timeout=10.0)
+        response = await self._exchange_code(code, token_url, data)
         if response.status_code == HTTP_OK:
-            token_data = response.json()
-            jwt = token_data.get("access_token")
-            html_content = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <title>JWT Token</title>
-    <style>
-        body {{
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-            align-items: center;
-            height: 100vh;
-            margin: 0;
-            font-family: Arial, sans-serif;
-            background-color: #f0f0f0;
-        }}
-        h1 {{
-            font-size: 2em;
-            margin-bottom: 20px;
-            color: #333;
-        }}
-        input {{
-            font-size: 1.2em;
-            padding: 10px;
-            width: 80%;
-            max-width: 600px;
-            text-align: center;
-            border: 2px solid #ccc;
-            border-radius: 5px;
-            cursor: pointer;
-        }}
-        p {{
-            font-size: 1em;
-            color: #666;
-            margin-top: 20px;
-        }}
-        #notification {{
-            display: none;
-            margin-top: 20px;
-            padding: 10px;
-            background-color: #4CAF50;
-            color: white;
-            border-radius: 5px;
-            font-size: 1em;
-        }}
-    </style>
-</head>
-<body>
-    <h1>Tu Token JWT</h1>
-    <input type="password" value="{jwt}" onclick="copyToClipboard(this.value)" readonly>
-    <p>Haz clic en el cuadro de texto para copiar el token al portapapeles</p>
-    <div id="notification">¡Token copiado al portapapeles!</div>
-    <script>
-        function copyToClipboard(text) {{
-            navigator.clipboard.writeText(text).then(function() {{
-                showNotification();
-            }}, function(err) {{
-                console.error('No se pudo copiar el texto: ', err);
-                alert('Error al copiar el token.');
-            }});
-        }}
-        function showNotification() {{
-            const notification = document.getElementById('notification');
-            notification.style.display = 'block';
-            setTimeout(function() {{
-                notification.style.display = 'none';
-            }}, 3000);
-        }}
-    </script>
-</body>
-</html>
-"""
+            # Validate straight from the raw body, skipping the intermediate dict
+            jwt = TokenResponse.model_validate_json(response.content).access_token
+            html_content = CALLBACK_HTML_TEMPLATE.format(jwt=jwt)
             return HTMLResponse(content=html_content)
         return JSONResponse({"error": "Failed to get token", "details": response.text})
 
-    async def _health_check(self) -> dict[str, str]:
+    async def _exchange_code(
+        self, code: str, token_url: str, data: dict[str, str]
+    ) -> httpx.Response:
+        """Exchange an authorization code, sharing the request with concurrent callers."""
+        exchange = self._token_exchanges.get(code)
+        if exchange is None:
+            exchange = asyncio.ensure_future(self._post_token(token_url, data))
+            self._token_exchanges[code] = exchange
+            exchange.add_done_callback(lambda _: self._token_exchanges.pop(code, None))
+        # A cancelled caller must not cancel the exchange other callers are waiting on
+        return await asyncio.shield(exchange)
+
+    async def _post_token(self, token_url: str, data: dict[str, str]) -> httpx.Response:
+        """POST to the token endpoint, limited by the token exchange semaphore."""
+        async with self._token_semaphore:
+            if self._http_client is not None:
+                return await self._http_client.post(token_url, data=data)
+            # Lifespan not running, fall back to a one-off client
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                return await client.post(token_url, data=data)
+
+    async def _health_check(self) -> Response:
         """Health check endpoint."""
-        return {"status": "ok"}  # pragma: no cover
+        return Response(content=HEALTH_CHECK_BODY, media_type="application/json")
@@ -5,16 +5,44 @@ This module implements the OAuth-related handlers for the MCP server,
 corresponding to the Go handlers.
 """
 
+import asyncio
+import hashlib
+import json
 import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from urllib.parse import urlparse
 
 import httpx
 from fastapi import HTTPException
+from fastapi.responses import Response
 
-from mcp_app.config import Configuration
+from mcp_app.config import Configuration, OAuthProtectedResourceConfig
 
 logger = logging.getLogger(__name__)
 
+# Seconds to keep a proxied OpenID configuration before fetching it again
+OPENID_CONFIG_CACHE_TTL = 300
+
+# Potentially sensitive fields stripped from proxied OpenID configurations
+SENSITIVE_OPENID_FIELDS = frozenset(
+    {
+        "private_key_jwt",
+        "client_secret",
+        "registration_access_token",
+        "introspection_endpoint_auth_signing_alg_values_supported",
+        # Add more as needed
+    }
+)
+
+
+@lru_cache(maxsize=128)
+def _uri_domain(uri: str) -> str:
+    """Get the domain of a URI, caching results since the same URIs repeat."""
+    return urlparse(uri).netloc
+
 
 class HandlersManager:
     """Manager for OAuth handlers."""
@@ -22,32 +50,57 @@ class HandlersManager:
     def __init__(self, config: Configuration) -> None:
         """Initialize the handlers manager."""
         self.config = config
+        # Whitelisted domain suffixes as a tuple so str.endswith can match them all at once
+        self._allowed_suffixes: tuple[str, ...] = tuple(config.oauth_whitelist_domains or ())
+        # Shared HTTP client, set by the app lifespan
+        self.http_client: httpx.AsyncClient | None = None
+        # Sanitized OpenID configurations keyed by issuer URI, with fetch time
+        self._openid_cache: dict[str, tuple[float, dict]] = {}
+        self._openid_lock = asyncio.Lock()
+        # The proxied issuer and its whitelist check are fixed after config load
+        auth_server = config.oauth_authorization_server
+        self._issuer_uri = auth_server.issuer_uri if auth_server and auth_server.enabled else None
+        self._issuer_allowed = self._issuer_uri is not None and self._is_uri_allowed(
+            self._issuer_uri
+        )
+        # Protected resource metadata is fixed after config load, so validate and build it
+        # once and serialize it up front so requests skip JSON encoding entirely
+        self._protected_resource_body = b"{}"
+        pr = config.oauth_protected_resource
+        if pr and pr.enabled:
+            self._check_protected_resource_uris(pr)
+            self._protected_resource_body = json.dumps(
+                self._build_protected_resource_response(pr), separators=(",", ":")
+            ).encode()
+        # The body never changes, so its ETag lets clients revalidate with a bodiless 304
+        self._protected_resource_etag = (
+            f'"{hashlib.sha256(self._protected_resource_body).hexdigest()[:32]}"'
+        )
+
+    @asynccontextmanager
+    async def _client(self) -> AsyncIterator[httpx.AsyncClient]:
+        """Yield the shared HTTP client, or a one-off client outside the app lifespan."""
+        if self.http_client is not None:
+            yield self.http_client
+        else:
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                yield client
 
     def _is_uri_allowed(self, uri: str) -> bool:
         """Check if URI domain is in OAuth whitelist."""
-        if not self.config.oauth_whitelist_domains:
+        if not self._allowed_suffixes:
             return True  # Allow all if no whitelist
-        parsed = urlparse(uri)
-        domain = parsed.netloc
-        return any(domain.endswith(allowed) for allowed in self.config.oauth_whitelist_domains)
+        return _uri_domain(uri).endswith(self._allowed_suffixes)
 
     def _sanitize_openid_config(self, data: dict) -> dict:
         """Sanitize OpenID configuration response."""
         # Remove potentially sensitive fields like private keys, secrets, etc.
-        sensitive_fields = {
-            "private_key_jwt",
-            "client_secret",
-            "registration_access_token",
-            "introspection_endpoint_auth_signing_alg_values_supported",
-            # Add more as needed
-        }
-        sanitized = {}
-        for key, value in data.items():
-            if key not in sensitive_fields:
-                sanitized[key] = value
-            else:
-                logger.warning("Removed sensitive field from OpenID config: %s", key)
-        return sanitized
+        removed = data.keys() & SENSITIVE_OPENID_FIELDS
+        if not removed:
+            return data
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("Removed sensitive fields from OpenID config: %s", sorted(removed))
+        return {k: v for k, v in data.items() if k not in removed}
 
     async def handle_oauth_authorization_server(self) -> dict:
         """
@@ -55,34 +108,55 @@ class HandlersManager:
 
         Proxies to the OpenID configuration from the issuer URI.
         """
-        if (
-            not self.config.oauth_authorization_server
-            or not self.config.oauth_authorization_server.enabled
-        ):
+        issuer_uri = self._issuer_uri
+        if issuer_uri is None:
             raise HTTPException(status_code=404, detail="OAuth authorization server not enabled")
-
-        issuer_uri = self.config.oauth_authorization_server.issuer_uri
-        if not self._is_uri_allowed(issuer_uri):
+        if not self._issuer_allowed:
             raise HTTPException(status_code=403, detail="Issuer URI not in allowed domains")
 
-        remote_url = f"{issuer_uri}/.well-known/openid-configuration"
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            try:
-                response = await client.get(remote_url)
-                response.raise_for_status()
-                data = response.json()
-                # Sanitize response: remove potentially sensitive fields
-                return self._sanitize_openid_config(data)
-            except httpx.HTTPError as e:
-                logger.exception("Error fetching OpenID config from %s", remote_url)
-                raise HTTPException(status_code=500, detail="Error fetching OpenID config") from e
-
-    async def handle_oauth_protected_resources(self) -> dict:
+        cached = self._get_cached_openid_config(issuer_uri)
+        if cached is not None:
+            return cached
+
+        # Only one caller fetches on a miss, the rest wait and reuse its result
+        async with self._openid_lock:
+            cached = self._get_cached_openid_config(issuer_uri)
+            if cached is not None:
+                return cached
+
+            remote_url = f"{issuer_uri}/.well-known/openid-configuration"
+            async with self._client() as client:
+                try:
+                    response = await client.get(remote_url)
+                    response.raise_for_status()
+                    data = response.json()
+                except httpx.HTTPError as e:
+                    logger.exception("Error fetching OpenID config from %s", remote_url)
+                    raise HTTPException(
+                        status_code=500, detail="Error fetching OpenID config"
+                    ) from e
+
+            # Sanitize response: remove potentially sensitive fields
+            sanitized = self._sanitize_openid_config(data)
+            self._openid_cache[issuer_uri] = (time.monotonic(), sanitized)
+            return sanitized
+
+    def _get_cached_openid_config(self, issuer_uri: str) -> dict | None:
+        """Get a cached OpenID configuration if it has not expired."""
+        cached = self._openid_cache.get(issuer_uri)
+        if cached is None:
+            return None
+        fetched_at, data = cached
+        if time.monotonic() - fetched_at >= OPENID_CONFIG_CACHE_TTL:
+            return None
+        return data
+
+    async def handle_oauth_protected_resources(self, if_none_match: str | None = None) -> Response:
         """
         Handle requests for /.well-known/oauth-protected-resource endpoint.
 
-        Returns the protected resource metadata according to RFC9728.
+        Returns the protected resource metadata according to RFC9728, or 304 Not Modified
+        when the If-None-Match header matches its ETag.
         """
         if (
             not self.config.oauth_protected_resource
@@ -90,17 +164,32 @@ class HandlersManager:
         ):
             raise HTTPException(status_code=404, detail="OAuth protected resource not enabled")
 
-        pr = self.config.oauth_protected_resource
-
-        # Validate URIs
+        headers = {"ETag": self._protected_resource_etag}
+        if if_none_match and self._etag_matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=self._protected_resource_body, media_type="application/json", headers=headers
+        )
+
+    def _etag_matches(self, if_none_match: str) -> bool:
+        """Check an If-None-Match header against the protected resource ETag."""
+        return any(
+            tag == "*" or tag.removeprefix("W/") == self._protected_resource_etag
+            for tag in (t.strip() for t in if_none_match.split(","))
+        )
+
+    def _check_protected_resource_uris(self, pr: OAuthProtectedResourceConfig) -> None:
+        """Check protected resource URIs against the whitelist, raising if any fail."""
         for auth_server in pr.auth_servers:
             if not self._is_uri_allowed(auth_server):
-                raise HTTPException(
-                    status_code=403, detail=f"Auth server URI not allowed: {auth_server}"
-                )
+                msg = f"Auth server URI not allowed: {auth_server}"
+                raise ValueError(msg)
         if not self._is_uri_allowed(pr.jwks_uri):
-            raise HTTPException(status_code=403, detail="JWKS URI not allowed")
+            msg = f"JWKS URI not allowed: {pr.jwks_uri}"
+            raise ValueError(msg)
 
+    def _build_protected_resource_response(self, pr: OAuthProtectedResourceConfig) -> dict:
+        """Build the protected resource metadata according to RFC9728."""
         response = {
             "resource": pr.resource,
             "authorization_servers": pr.auth_servers,
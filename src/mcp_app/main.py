@@ -19,6 +19,10 @@ from mcp_app.mcp_server import MCPServer
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Event loop and HTTP parser from uvicorn[standard]; uvloop is not available on Windows
+UVICORN_LOOP = "auto" if sys.platform == "win32" else "uvloop"
+UVICORN_HTTP = "httptools"
+
 # Initialize components
 app_config = AppConfig()
 app_config.load_configuration()
@@ -61,13 +65,15 @@ def main() -> None:
     else:
         # Default to HTTP
         host, port = get_host_and_port()
-        uvicorn.run(fastapi_app.app, host=host, port=port)
+        uvicorn.run(fastapi_app.app, host=host, port=port, loop=UVICORN_LOOP, http=UVICORN_HTTP)
 
 
 def main_http() -> None:
     """Run the HTTP server."""
     host, port = get_host_and_port()
-    uvicorn.run(fastapi_app.app, host=host, port=port)  # pragma: no cover
+    uvicorn.run(  # pragma: no cover
+        fastapi_app.app, host=host, port=port, loop=UVICORN_LOOP, http=UVICORN_HTTP
+    )
 
 
 def main_stdio() -> None:
@@ -1,6 +1,6 @@
 """Tool to say hello."""
 
-from mcp_app.context import get_jwt_payload
+from mcp_app.context import get_jwt_permissions
 
 
 def hello_world(name: str) -> str:
@@ -17,11 +17,10 @@ def hello_world(name: str) -> str:
         PermissionError: If user lacks required scope.
 
     """
-    payload = get_jwt_payload()
-    if payload:  # Only check scopes if JWT is present (HTTP mode)
-        permissions = payload.get("permissions", [])
-        if "tool:user" not in permissions:
-            msg = "Insufficient permissions: tool:user scope required"
-            raise PermissionError(msg)
+    permissions = get_jwt_permissions()
+    # Only check scopes if JWT is present (HTTP mode)
+    if permissions is not None and "tool:user" not in permissions:
+        msg = "Insufficient permissions: tool:user scope required"
+        raise PermissionError(msg)
     # In stdio mode (no JWT), allow execution
     return f"Hello, {name}! 👋"
@@ -2,7 +2,7 @@
 
 from typing import Any
 
-from mcp_app.context import get_jwt_payload
+from mcp_app.context import get_jwt_payload, get_jwt_permissions
 
 
 def whoami() -> dict[str, Any] | str:
@@ -22,8 +22,8 @@ def whoami() -> dict[str, Any] | str:
     if not payload:
         return "No JWT available (running in stdio mode or invalid token)"
 
-    permissions = payload.get("permissions", [])
-    if "tool:admin" not in permissions:
+    permissions = get_jwt_permissions()
+    if permissions is None or "tool:admin" not in permissions:
         msg = "Insufficient permissions: tool:admin scope required"
         raise PermissionError(msg)
 
@@ -4,19 +4,59 @@ Access logs middleware.
 Logs HTTP requests, excluding or redacting specified headers.
 """
 
-import json
 import logging
+import queue
 import time
-from collections.abc import Awaitable, Callable
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+import orjson
+from starlette.datastructures import URL
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from mcp_app.middlewares.health import HEALTH_CHECK_PATH
 
 logger = logging.getLogger(__name__)
 
+# Logged in place of redacted header values
+REDACTED_VALUE = "[REDACTED]"
+
+# Redacted regardless of configuration
+DEFAULT_REDACTED_HEADERS = frozenset({"authorization", "x-api-key", "x-auth-token", "cookie"})
+
+# Paths not logged by default, since probes hit them at a high rate
+DEFAULT_SILENT_PATHS = frozenset({HEALTH_CHECK_PATH})
+
+
+@contextmanager
+def queued_access_logs() -> Iterator[None]:
+    """
+    Write access logs from a background thread while the context is active.
 
-class AccessLogsMiddleware(BaseHTTPMiddleware):
+    The access logger only enqueues records, and a listener thread passes them to the
+    root logger's handlers, so handler I/O does not block the event loop.
+    """
+    handlers = logging.getLogger().handlers
+    if not handlers:
+        yield
+        return
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    listener.start()
+    try:
+        yield
+    finally:
+        listener.stop()
+        logger.removeHandler(queue_handler)
+        logger.propagate = True
+
+
+class AccessLogsMiddleware:
     """Middleware for logging access logs."""
 
     def __init__(
@@ -25,63 +65,113 @@ class AccessLogsMiddleware(BaseHTTPMiddleware):
         excluded_headers: list[str] | None = None,
         redacted_headers: list[str] | None = None,
         max_body_size: int = 1024,  # Max body size to log in bytes
+        silent_paths: Iterable[str] | None = None,
     ) -> None:
         """Initialize the access logs middleware."""
-        super().__init__(app)
-        self.excluded_headers = set(excluded_headers or [])
-        # Default redacted headers for security
-        default_redacted = {"authorization", "x-api-key", "x-auth-token", "cookie"}
-        self.redacted_headers = set(redacted_headers or []) | default_redacted
+        self.app = app
+        # Header names arrive lower-cased, so normalize the configured ones once
+        self.excluded_headers = frozenset(h.lower() for h in excluded_headers or [])
+        self.redacted_headers = (
+            frozenset(h.lower() for h in redacted_headers or []) | DEFAULT_REDACTED_HEADERS
+        )
+        # Byte forms for matching raw ASGI header names without decoding them
+        self._excluded_raw = frozenset(h.encode("latin-1") for h in self.excluded_headers)
+        self._redacted_raw = frozenset(h.encode("latin-1") for h in self.redacted_headers)
         self.max_body_size = max_body_size
+        self.silent_paths = (
+            DEFAULT_SILENT_PATHS if silent_paths is None else frozenset(silent_paths)
+        )
 
-    async def dispatch(
-        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
-    ) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process the request and log access information."""
+        # Skip body reading and log building entirely when access logs would be dropped
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self.silent_paths
+            or not logger.isEnabledFor(logging.INFO)
+        ):
+            await self.app(scope, receive, send)
+            return
+
         start_time = time.time()
+        # Monotonic clock for the duration, wall clock only for the logged timestamps
+        start_counter = time.perf_counter()
+
+        # Header names are lower-case by the ASGI spec; latin-1 matches Starlette's decoding
+        raw_headers = scope["headers"]
+        headers = {
+            name.decode("latin-1"): (
+                REDACTED_VALUE if name in self._redacted_raw else value.decode("latin-1")
+            )
+            for name, value in raw_headers
+            if name not in self._excluded_raw
+        }
+        content_length = next((v for n, v in raw_headers if n == b"content-length"), None)
 
         # Read request body if small enough
         body = None
-        if request.headers.get("content-length"):
+        if content_length:
             try:
-                content_length = int(request.headers["content-length"])
-                if content_length <= self.max_body_size:
-                    body_bytes = await request.body()
+                if int(content_length) <= self.max_body_size:
+                    messages, body_bytes = await _read_body(receive)
+                    # The body stream is consumed, so replay it to the app
+                    receive = _replay(messages, receive)
                     body = body_bytes.decode("utf-8", errors="replace")
             except (ValueError, UnicodeDecodeError):
                 body = "[BINARY OR INVALID BODY]"
 
-        # Log request
-        headers = {}
-        for name, value in request.headers.items():
-            if name.lower() in self.excluded_headers:
-                continue
-            if name.lower() in self.redacted_headers:
-                headers[name] = "[REDACTED]"
-            else:
-                headers[name] = value
-
         # Structured logging for request
         request_log = {
             "event": "request",
-            "method": request.method,
-            "url": str(request.url),
+            "method": scope["method"],
+            "url": str(URL(scope=scope)),
             "headers": headers,
             "body": body,
             "timestamp": start_time,
         }
-        logger.info(json.dumps(request_log))
+        logger.info(orjson.dumps(request_log).decode())
+
+        status_code = None
 
-        response = await call_next(request)
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
         # Log response
-        duration = time.time() - start_time
+        duration = time.perf_counter() - start_counter
         response_log = {
             "event": "response",
-            "status_code": response.status_code,
+            "status_code": status_code,
             "duration": round(duration, 3),
             "timestamp": time.time(),
         }
-        logger.info(json.dumps(response_log))
+        logger.info(orjson.dumps(response_log).decode())
+
+
+async def _read_body(receive: Receive) -> tuple[list[Message], bytes]:
+    """Read the whole request body, returning the received messages and the body."""
+    messages: list[Message] = []
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break  # Client disconnected
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return messages, b"".join(chunks)
+
+
+def _replay(messages: list[Message], receive: Receive) -> Receive:
+    """Build a receive callable that returns already received messages before delegating."""
+    pending = iter(messages)
+
+    async def replay() -> Message:
+        return next(pending, None) or await receive()
 
-        return response
+    return replay
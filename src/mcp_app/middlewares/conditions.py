@@ -0,0 +1,264 @@
+"""
+Allow conditions for JWT validation.
+
+Compiles a small CEL-like expression subset over the JWT payload into Python closures,
+so conditions are parsed and validated once and never go through eval.
+
+Supported syntax:
+    - Literals: strings, numbers, true/false/null (or True/False/None), lists and tuples
+    - Payload access: payload.field, payload_['field'], nested fields and list indexes
+    - Operators: and/&&, or/||, not/!, ==, !=, <, <=, >, >=, in, not in
+    - Functions: has(payload.field), size(value)
+    - Methods: value.startswith(str), value.endswith(str),
+      list.exists(x, condition), list.all(x, condition)
+"""
+
+import ast
+import operator
+import re
+import sys
+from collections.abc import Callable
+from typing import Any
+
+# Variables an expression is evaluated against: the payload and any macro variables
+Env = dict[str, Any]
+Evaluator = Callable[[Env], Any]
+ConditionCheck = Callable[[dict[str, Any]], bool]
+
+PAYLOAD_NAMES = frozenset({"payload", "payload_"})
+_LITERAL_NAMES = {"true": True, "false": False, "null": None}
+_CONTAINERS = (list, tuple, set, frozenset, dict)
+_STRING_METHODS = frozenset({"startswith", "endswith"})
+_MACRO_METHODS = {"exists": any, "all": all}
+# CEL logical operators, matched outside string literals and rewritten to Python's
+_CEL_OPERATORS = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|&&|\|\||!(?!=)""")
+_CEL_KEYWORDS = {"&&": " and ", "||": " or ", "!": " not "}
+
+
+class UnsupportedConditionError(ValueError):
+    """Raised when a condition uses syntax outside the supported subset."""
+
+
+def _contains(item: Any, container: Any) -> bool:  # noqa: ANN401
+    """Membership test that only accepts containers, like CEL's in operator."""
+    if not isinstance(container, _CONTAINERS):
+        msg = f"'in' needs a list or map, got {type(container).__name__}"
+        raise TypeError(msg)
+    return item in container
+
+
+def _not_contains(item: Any, container: Any) -> bool:  # noqa: ANN401
+    """Negated membership test that only accepts containers."""
+    return not _contains(item, container)
+
+
+_COMPARE_OPS: dict[type[ast.cmpop], Callable[[Any, Any], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: _contains,
+    ast.NotIn: _not_contains,
+}
+
+
+def _as_bool(value: Any) -> bool:  # noqa: ANN401
+    """Require a boolean operand, as CEL does for logical operators."""
+    if not isinstance(value, bool):
+        msg = f"Expected a boolean, got {type(value).__name__}"
+        raise TypeError(msg)
+    return value
+
+
+def _get_field(value: Any, key: Any) -> Any:  # noqa: ANN401
+    """Read a map field (None when missing) or a list index."""
+    if isinstance(value, dict):
+        return value.get(key)
+    if isinstance(value, list | tuple) and isinstance(key, int):
+        return value[key]
+    msg = f"Cannot read {key!r} from {type(value).__name__}"
+    raise TypeError(msg)
+
+
+def compile_condition(expression: str) -> ConditionCheck:
+    """
+    Compile a condition into a check that runs against a JWT payload.
+
+    The check returns True only when the expression evaluates to True; evaluation errors,
+    such as comparing incompatible types or reading fields of a missing claim, count as
+    a failed condition.
+
+    Raises:
+        UnsupportedConditionError: If the expression is invalid or uses unsupported syntax.
+
+    """
+    try:
+        tree = ast.parse(_translate_operators(expression).strip(), mode="eval")
+    except SyntaxError as e:
+        msg = f"Invalid condition syntax: {expression!r}"
+        raise UnsupportedConditionError(msg) from e
+    evaluate = _compile(tree.body, frozenset())
+
+    def check(payload: dict[str, Any]) -> bool:
+        try:
+            return evaluate({"payload": payload}) is True
+        except (TypeError, ValueError, IndexError):
+            return False
+
+    return check
+
+
+def _translate_operators(expression: str) -> str:
+    """Rewrite CEL's &&, || and ! operators to Python, leaving string literals untouched."""
+    return _CEL_OPERATORS.sub(
+        lambda match: match.group(1) or _CEL_KEYWORDS[match.group()], expression
+    )
+
+
+def _compile(node: ast.expr, variables: frozenset[str]) -> Evaluator:  # noqa: PLR0911
+    """Compile an expression node, with macro variables currently in scope."""
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, str | int | float | bool | None):
+            _unsupported(node)
+        value = node.value
+        return lambda _: value
+
+    if isinstance(node, ast.List | ast.Tuple):
+        items = [_compile(item, variables) for item in node.elts]
+        return lambda env: [item(env) for item in items]
+
+    if isinstance(node, ast.Name):
+        return _compile_name(node, variables)
+
+    if isinstance(node, ast.Attribute):
+        if node.attr.startswith("_"):
+            _unsupported(node)
+        base = _compile(node.value, variables)
+        attr = sys.intern(node.attr)
+        return lambda env: _get_field(base(env), attr)
+
+    if isinstance(node, ast.Subscript):
+        base = _compile(node.value, variables)
+        # Constant keys (the common payload_['claim'] form) are resolved at compile time
+        if isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str | int):
+            constant_key = node.slice.value
+            if isinstance(constant_key, str):
+                constant_key = sys.intern(constant_key)
+            return lambda env: _get_field(base(env), constant_key)
+        key = _compile(node.slice, variables)
+        return lambda env: _get_field(base(env), key(env))
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile(value, variables) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda env: all(_as_bool(operand(env)) for operand in operands)
+        return lambda env: any(_as_bool(operand(env)) for operand in operands)
+
+    if isinstance(node, ast.UnaryOp):
+        if not isinstance(node.op, ast.Not):
+            _unsupported(node)
+        operand = _compile(node.operand, variables)
+        return lambda env: not _as_bool(operand(env))
+
+    if isinstance(node, ast.Compare):
+        return _compile_compare(node, variables)
+
+    if isinstance(node, ast.Call):
+        return _compile_call(node, variables)
+
+    return _unsupported(node)
+
+
+def _compile_name(node: ast.Name, variables: frozenset[str]) -> Evaluator:
+    """Compile a variable reference or a CEL literal name."""
+    name = node.id
+    if name in PAYLOAD_NAMES:
+        return lambda env: env["payload"]
+    if name in variables:
+        return lambda env: env[name]
+    if name in _LITERAL_NAMES:
+        value = _LITERAL_NAMES[name]
+        return lambda _: value
+    return _unsupported(node)
+
+
+def _compile_compare(node: ast.Compare, variables: frozenset[str]) -> Evaluator:
+    """Compile a (possibly chained) comparison."""
+    left = _compile(node.left, variables)
+    steps = []
+    for op, comparator in zip(node.ops, node.comparators, strict=True):
+        compare = _COMPARE_OPS.get(type(op))
+        if compare is None:
+            _unsupported(node)
+        steps.append((compare, _compile(comparator, variables)))
+
+    def evaluate(env: Env) -> bool:
+        current = left(env)
+        for compare, right in steps:
+            value = right(env)
+            if not compare(current, value):
+                return False
+            current = value
+        return True
+
+    return evaluate
+
+
+def _compile_call(node: ast.Call, variables: frozenset[str]) -> Evaluator:
+    """Compile one of the supported functions or methods."""
+    if node.keywords:
+        _unsupported(node)
+    func = node.func
+
+    if isinstance(func, ast.Name) and len(node.args) == 1:
+        (arg,) = node.args
+        if func.id == "has" and isinstance(arg, ast.Attribute) and not arg.attr.startswith("_"):
+            base = _compile(arg.value, variables)
+            attr = arg.attr
+            return lambda env: isinstance(value := base(env), dict) and attr in value
+        if func.id == "size":
+            value = _compile(arg, variables)
+            return lambda env: len(value(env))
+
+    if isinstance(func, ast.Attribute):
+        receiver = _compile(func.value, variables)
+
+        if func.attr in _STRING_METHODS and len(node.args) == 1:
+            method = func.attr
+            arg = _compile(node.args[0], variables)
+
+            def call_string_method(env: Env) -> bool:
+                value, prefix = receiver(env), arg(env)
+                if not isinstance(value, str) or not isinstance(prefix, str):
+                    msg = f"{method} needs strings"
+                    raise TypeError(msg)
+                return getattr(value, method)(prefix)
+
+            return call_string_method
+
+        if func.attr in _MACRO_METHODS and len(node.args) == 2:  # noqa: PLR2004
+            variable, body = node.args
+            if not isinstance(variable, ast.Name) or variable.id in PAYLOAD_NAMES:
+                return _unsupported(node)
+            name = variable.id
+            predicate = _compile(body, variables | {name})
+            reduce = _MACRO_METHODS[func.attr]
+
+            def call_macro(env: Env) -> bool:
+                items = receiver(env)
+                if not isinstance(items, list | tuple):
+                    msg = f"{func.attr} needs a list"
+                    raise TypeError(msg)
+                return reduce(_as_bool(predicate({**env, name: item})) for item in items)
+
+            return call_macro
+
+    return _unsupported(node)
+
+
+def _unsupported(node: ast.AST) -> Evaluator:
+    """Reject syntax outside the supported subset."""
+    msg = f"Unsupported syntax in condition: {ast.unparse(node)}"
+    raise UnsupportedConditionError(msg)
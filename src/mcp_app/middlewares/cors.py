@@ -0,0 +1,26 @@
+"""
+CORS middleware.
+
+Starlette's CORS middleware with configured origins checked against a set.
+"""
+
+from functools import cached_property
+
+from starlette.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+
+
+class CORSMiddleware(StarletteCORSMiddleware):
+    """CORS middleware that looks up allowed origins in a frozenset instead of a list."""
+
+    @cached_property
+    def allowed_origin_set(self) -> frozenset[str]:
+        """Configured origins as a set, built on first use."""
+        return frozenset(self.allow_origins)
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        """Check if the origin is allowed."""
+        if self.allow_all_origins or origin in self.allowed_origin_set:
+            return True
+        return self.allow_origin_regex is not None and bool(
+            self.allow_origin_regex.fullmatch(origin)
+        )
@@ -0,0 +1,36 @@
+"""
+Health check middleware.
+
+Answers health probes before they reach the rest of the middleware stack.
+"""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+HEALTH_CHECK_PATH = "/health"
+
+# Static health check body, served as-is without per-request JSON encoding
+HEALTH_CHECK_BODY = b'{"status":"ok"}'
+
+_HEALTH_CHECK_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(HEALTH_CHECK_BODY)).encode()),
+]
+
+
+class HealthCheckMiddleware:
+    """Middleware that responds to health checks without running the inner app."""
+
+    def __init__(self, app: ASGIApp, path: str = HEALTH_CHECK_PATH) -> None:
+        """Initialize the health check middleware."""
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Respond to GET requests on the health check path, pass anything else through."""
+        if scope["type"] == "http" and scope["path"] == self.path and scope["method"] == "GET":
+            await send(
+                {"type": "http.response.start", "status": 200, "headers": _HEALTH_CHECK_HEADERS}
+            )
+            await send({"type": "http.response.body", "body": HEALTH_CHECK_BODY})
+            return
+        await self.app(scope, receive, send)
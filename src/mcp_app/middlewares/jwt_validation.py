@@ -4,159 +4,403 @@ JWT validation middleware.
 Supports local validation with JWKS and CEL expressions, or delegated to external systems.
 """
 
+import asyncio
 import logging
+import math
+import re
 import time
-from collections.abc import Awaitable, Callable
+from collections.abc import Iterable
+from functools import lru_cache
 from typing import Any
 from urllib.parse import urlparse
 
+import httpx
 import jwt
-import requests
-from fastapi import HTTPException, Request, Response, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
-from starlette.types import ASGIApp
+import orjson
+from fastapi import HTTPException, status
+from jwt.utils import base64url_decode
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from mcp_app.context import set_jwt_context
+from mcp_app.middlewares.conditions import (
+    ConditionCheck,
+    UnsupportedConditionError,
+    compile_condition,
+)
 
 logger = logging.getLogger(__name__)
 
 # Constants
 MAX_RATE_LIMIT_REQUESTS = 10
-TOKEN_MASK_LENGTH = 10
-ENDSWITH_PARTS_COUNT = 2
+# Seconds after which per-IP request counts start over
+RATE_LIMIT_WINDOW = 60
+
+# Paths served without a token: the OAuth flow, health probes and OAuth metadata
+DEFAULT_SKIP_PATHS = frozenset(
+    {
+        "/login",
+        "/callback",
+        "/error",
+        "/health",
+        "/.well-known/oauth-authorization-server",
+        "/.well-known/oauth-protected-resource",
+    }
+)
+
+# Accepted signing algorithms and claim checks, shared by every decode call
+JWT_ALGORITHMS = ("RS256",)
+JWT_DECODE_OPTIONS = {"verify_exp": True, "verify_iss": True, "verify_aud": True}
+
+# Verified token payloads kept, and for how long in seconds at most, so repeated requests
+# with the same token skip signature verification
+VERIFIED_TOKEN_CACHE_SIZE = 1024
+VERIFIED_TOKEN_CACHE_TTL = 300
+
+# Multiple of the cache interval after which stale JWKS keys are no longer served
+STALE_KEYS_FACTOR = 2
+
+# Minimum key age in seconds before an unknown kid triggers a refresh, so rotated keys are
+# picked up early without letting made-up kids force a fetch on every request
+UNKNOWN_KID_REFRESH_INTERVAL = 30
+
+# Connection attempts retried per JWKS fetch before giving up
+JWKS_CONNECT_RETRIES = 2
+
+# Upper bound for a JWKS max-age, so rotated keys are still picked up within a day
+MAX_JWKS_CACHE_INTERVAL = 86400
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+@lru_cache(maxsize=64)
+def _error_body(detail: str) -> bytes:
+    """Serialize an error response body, once per distinct detail message."""
+    return orjson.dumps({"detail": detail})
+
+
+def get_unverified_header(token: str) -> dict[str, Any]:
+    """
+    Decode the header of a JWT without verifying it.
+
+    Unlike jwt.get_unverified_header, only the header segment is decoded; the payload and
+    signature are left for jwt.decode, which parses them during verification anyway.
+
+    Raises:
+        jwt.DecodeError: If the header segment is missing or malformed.
+
+    """
+    header_segment, separator, _ = token.partition(".")
+    if not separator:
+        msg = "Not enough segments"
+        raise jwt.DecodeError(msg)
+    try:
+        header = orjson.loads(base64url_decode(header_segment))
+    except ValueError as e:
+        msg = "Invalid header padding or encoding"
+        raise jwt.DecodeError(msg) from e
+    if not isinstance(header, dict):
+        msg = "Invalid header string: must be a json object"
+        raise jwt.DecodeError(msg)
+    return header
 
 
 class JWKSCache:
-    """JWKS cache with TTL."""
+    """
+    JWKS cache with TTL.
+
+    Keys older than the cache interval are still served while a background refresh runs,
+    for up to one more interval; past that, or with no keys yet, callers wait for the
+    refresh. An unknown kid also triggers a refresh, so rotated keys are picked up early.
+    """
+
+    __slots__ = (
+        "_client",
+        "_etag",
+        "_jwks",
+        "_last_attempt",
+        "_last_modified",
+        "_lock",
+        "_min_cache_interval",
+        "_refresh_task",
+        "cache_interval",
+        "keys",
+        "last_updated",
+        "uri",
+    )
 
     def __init__(self, uri: str, cache_interval: int = 300) -> None:
         """Initialize the JWKS cache."""
         self.uri = uri
         self.cache_interval = cache_interval
+        # The configured interval is the floor; a longer Cache-Control max-age extends it
+        self._min_cache_interval = cache_interval
+        # Validators from the last response, sent back so unchanged keys cost a bodiless 304
+        self._etag: str | None = None
+        self._last_modified: str | None = None
         self.keys: dict[str, Any] = {}
-        self.last_updated = 0
-
-    def get_key(self, kid: str) -> dict[str, Any] | None:
-        """Get key by kid, refreshing cache if needed."""
-        now = time.time()
-        if now - self.last_updated > self.cache_interval:
-            self._refresh_keys()
-        return self.keys.get(kid)
-
-    def _refresh_keys(self) -> None:
-        """Refresh JWKS from URI."""
-        try:
-            response = requests.get(self.uri, timeout=10)
-            response.raise_for_status()
-            jwks = response.json()
-            self.keys = {key["kid"]: key for key in jwks.get("keys", []) if "kid" in key}
-            self.last_updated = time.time()
-            logger.info("Refreshed JWKS with %s keys", len(self.keys))
-        except Exception:
-            logger.exception("Failed to refresh JWKS")
+        # Parsed keys built from self.keys on first use, reset on every refresh
+        self._jwks: dict[str, jwt.PyJWK] = {}
+        self.last_updated = 0.0
+        # Monotonic time of the last fetch, successful or not, for throttling refreshes
+        self._last_attempt = -math.inf
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task[None] | None = None
+        # Kept across refreshes so pooled connections skip the DNS lookup and TLS handshake
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the HTTP client for JWKS fetches, creating it on first use."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=10.0,
+                transport=httpx.AsyncHTTPTransport(retries=JWKS_CONNECT_RETRIES),
+            )
+        return self._client
 
+    async def aclose(self) -> None:
+        """Close the HTTP client, if one was created."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
-class JWTValidationMiddleware(BaseHTTPMiddleware):
+    async def get_key(self, kid: str) -> dict[str, Any] | None:
+        """Get key by kid, refreshing cache if needed."""
+        age = time.time() - self.last_updated
+        if age > self.cache_interval:
+            if not self.keys or age > STALE_KEYS_FACTOR * self.cache_interval:
+                await self._refresh_keys()
+                return self.keys.get(kid)
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_keys())
+        key = self.keys.get(kid)
+        if key is None and time.monotonic() - self._last_attempt > UNKNOWN_KID_REFRESH_INTERVAL:
+            # The token may be signed with a key rotated in since the last fetch
+            await self._refresh_keys(UNKNOWN_KID_REFRESH_INTERVAL)
+            key = self.keys.get(kid)
+        return key
+
+    async def get_jwk(self, kid: str) -> jwt.PyJWK | None:
+        """Get the parsed JWK for a kid, building it only once per refresh."""
+        key_data = await self.get_key(kid)
+        if key_data is None:
+            return None
+        jwk = self._jwks.get(kid)
+        if jwk is None:
+            jwk = self._jwks[kid] = jwt.PyJWK(key_data)
+        return jwk
+
+    async def _refresh_keys(self, min_interval: float | None = None) -> None:
+        """
+        Refresh JWKS from URI, unless another caller refreshed while this one waited.
+
+        With min_interval, the refresh is also skipped if any fetch, failed or not, was
+        attempted within that many seconds, so an unreachable endpoint is not hit per call.
+        """
+        async with self._lock:
+            if min_interval is None:
+                if time.time() - self.last_updated <= self.cache_interval:
+                    return
+            elif time.monotonic() - self._last_attempt <= min_interval:
+                return
+            self._last_attempt = time.monotonic()
+            try:
+                client = self._get_client()
+                response = await client.get(self.uri, headers=self._conditional_headers())
+                self._update_cache_interval(response.headers.get("cache-control"))
+                if response.status_code == httpx.codes.NOT_MODIFIED:
+                    self.last_updated = time.time()
+                    logger.debug("JWKS not modified, keeping %s keys", len(self.keys))
+                    return
+                response.raise_for_status()
+                jwks = orjson.loads(response.content)
+                self.keys = {key["kid"]: key for key in jwks.get("keys", []) if "kid" in key}
+                self._jwks = {}
+                self._etag = response.headers.get("etag")
+                self._last_modified = response.headers.get("last-modified")
+                self.last_updated = time.time()
+                logger.info("Refreshed JWKS with %s keys", len(self.keys))
+            except Exception:
+                logger.exception("Failed to refresh JWKS")
+
+    def _conditional_headers(self) -> dict[str, str]:
+        """Build conditional request headers from the last response's validators."""
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+        return headers
+
+    def _update_cache_interval(self, cache_control: str | None) -> None:
+        """Extend the cache interval to the response's max-age, within bounds."""
+        match = _MAX_AGE_RE.search(cache_control) if cache_control else None
+        max_age = int(match.group(1)) if match else 0
+        self.cache_interval = max(self._min_cache_interval, min(max_age, MAX_JWKS_CACHE_INTERVAL))
+
+
+class JWTValidationMiddleware:
     """Middleware for JWT validation."""
 
+    __slots__ = (
+        "_condition_checks",
+        "_rate_limit_window_start",
+        "_skip_paths",
+        "_verified_tokens",
+        "_whitelist_suffixes",
+        "allow_conditions",
+        "app",
+        "audience",
+        "issuer",
+        "jwks",
+        "rate_limit",
+        "strategy",
+        "whitelist_domains",
+    )
+
     def __init__(
         self,
         app: ASGIApp,
         strategy: str = "external",
-        forwarded_header: str = "X-Validated-Jwt",
         jwks_uri: str | None = None,
         cache_interval: int = 300,
         allow_conditions: list[str] | None = None,
         whitelist_domains: list[str] | None = None,
         issuer: str | None = None,
         audience: str | None = None,
+        skip_paths: Iterable[str] | None = None,
+        jwks_cache: JWKSCache | None = None,
     ) -> None:
-        """Initialize the JWT validation middleware."""
-        super().__init__(app)
+        """
+        Initialize the JWT validation middleware.
+
+        Raises:
+            ValueError: If the local strategy has no JWKS URI or one outside the whitelist.
+
+        """
+        self.app = app
+        self._skip_paths = DEFAULT_SKIP_PATHS if skip_paths is None else frozenset(skip_paths)
         self.strategy = strategy
-        self.forwarded_header = forwarded_header
-        self.jwks = JWKSCache(jwks_uri, cache_interval) if jwks_uri else None
         self.allow_conditions = allow_conditions or []
+        # Parse conditions once here instead of on every request
+        self._condition_checks = [self._compile_condition(c) for c in self.allow_conditions]
         self.whitelist_domains = whitelist_domains or []
+        # Suffixes as a tuple so str.endswith can match them all in one call
+        self._whitelist_suffixes = tuple(self.whitelist_domains)
         self.issuer = issuer
         self.audience = audience
-        self.rate_limit: dict[str, int] = {}  # Simple rate limit by IP
-
-        if strategy == "local" and jwks_uri:
+        self.rate_limit: dict[str, int] = {}  # Simple rate limit by IP, per window
+        self._rate_limit_window_start = time.monotonic()
+        # Payloads of verified tokens with their expiry, keyed by the token itself
+        self._verified_tokens: dict[str, tuple[float, dict[str, Any]]] = {}
+
+        if strategy == "local":
+            if not jwks_uri:
+                msg = "Local JWT validation requires a JWKS URI"
+                raise ValueError(msg)
             if not self._is_uri_allowed(jwks_uri):
                 msg = f"JWKS URI {jwks_uri} not in whitelist"
                 raise ValueError(msg)
-            self.jwks = JWKSCache(jwks_uri, cache_interval)
+        # A cache passed in for jwks_uri stays owned by the caller, which closes its client
+        if jwks_cache is None and jwks_uri:
+            jwks_cache = JWKSCache(jwks_uri, cache_interval)
+        self.jwks = jwks_cache
 
     def _is_uri_allowed(self, uri: str) -> bool:
         """Check if URI domain is in whitelist."""
-        if not self.whitelist_domains:
+        if not self._whitelist_suffixes:
             return True  # Allow all if no whitelist
-        parsed = urlparse(uri)
-        domain = parsed.netloc
-        return any(domain.endswith(allowed) for allowed in self.whitelist_domains)
+        return urlparse(uri).netloc.endswith(self._whitelist_suffixes)
 
-    async def dispatch(
-        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
-    ) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process the request and validate JWT if configured."""
-        # Skip JWT validation for OPTIONS requests (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
-
-        # Skip JWT validation for OAuth endpoints
-        if request.url.path in ["/login", "/callback", "/error"]:
-            return await call_next(request)
+        # Skip JWT validation for unauthenticated paths and OPTIONS requests (CORS preflight)
+        if (
+            scope["type"] != "http"
+            or scope["path"] in self._skip_paths
+            or scope["method"] == "OPTIONS"
+        ):
+            await self.app(scope, receive, send)
+            return
 
         if self.strategy == "local":
             try:
-                await self._validate_local(request)
+                await self._validate_local(scope)
             except HTTPException as e:
-                return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+                response = Response(
+                    _error_body(e.detail), status_code=e.status_code, media_type="application/json"
+                )
+                await response(scope, receive, send)
+                return
         # For external strategy, assume JWT is already validated by upstream proxy
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
-    async def _validate_local(self, request: Request) -> None:
+    async def _validate_local(self, scope: Scope) -> None:
         """Validate JWT locally."""
+        method, path = scope["method"], scope["path"]
         # Simple rate limiting
-        client_ip = request.client.host if request.client else "unknown"
-        if self.rate_limit.get(client_ip, 0) > MAX_RATE_LIMIT_REQUESTS:
-            logger.warning(
-                "Rate limit exceeded from %s for %s %s", client_ip, request.method, request.url.path
-            )
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded",
-            )
-        self.rate_limit[client_ip] = self.rate_limit.get(client_ip, 0) + 1
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        self._check_rate_limit(client_ip, method, path)
 
-        auth_header = request.headers.get("Authorization")
-        if not auth_header or not auth_header.startswith("Bearer "):
+        # Header names are lower-case by the ASGI spec, so match the raw bytes directly
+        auth_header = next((v for n, v in scope["headers"] if n == b"authorization"), None)
+        if not auth_header or not auth_header.startswith(b"Bearer "):
             logger.warning(
                 "Missing or invalid Authorization header from %s for %s %s",
                 client_ip,
-                request.method,
-                request.url.path,
+                method,
+                path,
             )
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid Authorization header",
             )
 
-        token = auth_header[7:]  # Remove "Bearer "
+        token = auth_header[7:].decode("latin-1")  # Remove "Bearer "
+
+        # Tokens verified recently skip the signature check, the costliest step
+        payload = self._get_verified_payload(token)
+        if payload is None:
+            payload = await self._verify_token(token, client_ip, method, path)
+            self._store_verified_payload(token, payload)
 
+        # Check allow conditions
+        for check in self._condition_checks:
+            if not check(payload):
+                logger.warning(
+                    "JWT does not meet conditions from %s for %s %s",
+                    client_ip,
+                    method,
+                    path,
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="JWT does not meet conditions",
+                )
+
+        # Expose the validated JWT to downstream handlers as request.state
+        state = scope.setdefault("state", {})
+        state["validated_jwt"] = token
+        state["jwt_payload"] = payload
+
+        # Set JWT in shared context for MCP tools
+        set_jwt_context(token, payload)
+
+    async def _verify_token(
+        self, token: str, client_ip: str, method: str, path: str
+    ) -> dict[str, Any]:
+        """Verify a token's signature and claims against the JWKS, returning its payload."""
         # Decode header to get kid
         try:
-            header = jwt.get_unverified_header(token)
+            header = get_unverified_header(token)
         except jwt.PyJWTError as e:
             detail = f"Invalid JWT header: {type(e).__name__}"
             logger.warning(
                 "Invalid JWT header from %s for %s %s: %s",
                 client_ip,
-                request.method,
-                request.url.path,
+                method,
+                path,
                 detail,
             )
             raise HTTPException(
@@ -179,117 +423,113 @@ class JWTValidationMiddleware(BaseHTTPMiddleware):
                 detail="JWKS not configured",
             )
 
-        key_data = self.jwks.get_key(kid)
-        if not key_data:
-            logger.warning(
-                "Key not found in JWKS for kid %s from %s for %s %s",
-                kid,
-                client_ip,
-                request.method,
-                request.url.path,
-            )
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Key not found in JWKS",
-            )
-
-        # Convert JWK to PEM
         try:
-            jwk = jwt.PyJWK(key_data)
-            public_key = jwk.key
+            jwk = await self.jwks.get_jwk(kid)
         except Exception as e:
             logger.warning(
                 "Invalid JWK from %s for %s %s: %s",
                 client_ip,
-                request.method,
-                request.url.path,
+                method,
+                path,
                 type(e).__name__,
             )
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Invalid JWK: {type(e).__name__}",
             ) from e
+        if jwk is None:
+            logger.warning(
+                "Key not found in JWKS for kid %s from %s for %s %s",
+                kid,
+                client_ip,
+                method,
+                path,
+            )
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Key not found in JWKS",
+            )
 
-        # Verify and decode JWT
+        # Verify and decode JWT; passing the PyJWK skips the per-call algorithm lookup
+        # and key preparation
         try:
             payload = jwt.decode(
                 token,
-                public_key,
-                algorithms=["RS256"],
+                jwk,
+                algorithms=JWT_ALGORITHMS,
                 audience=self.audience,
                 issuer=self.issuer,
-                options={"verify_exp": True, "verify_iss": True, "verify_aud": True},
+                options=JWT_DECODE_OPTIONS,
             )
         except jwt.ExpiredSignatureError as err:
-            logger.warning(
-                "JWT expired from %s for %s %s", client_ip, request.method, request.url.path
-            )
+            logger.warning("JWT expired from %s for %s %s", client_ip, method, path)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="JWT expired",
             ) from err
         except jwt.InvalidTokenError as err:
-            logger.warning(
-                "Invalid JWT from %s for %s %s", client_ip, request.method, request.url.path
-            )
+            logger.warning("Invalid JWT from %s for %s %s", client_ip, method, path)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid JWT",
             ) from err
-
-        # Check allow conditions
-        for condition in self.allow_conditions:
-            if not self._check_condition(condition, payload):
+        return payload
+
+    def _get_verified_payload(self, token: str) -> dict[str, Any] | None:
+        """Get the payload of a token verified earlier, unless it has expired since."""
+        cached = self._verified_tokens.get(token)
+        if cached is None:
+            return None
+        expires_at, payload = cached
+        if time.time() >= expires_at:
+            del self._verified_tokens[token]
+            return None
+        # Each request gets its own copy, so downstream changes never reach the cache
+        return dict(payload)
+
+    def _store_verified_payload(self, token: str, payload: dict[str, Any]) -> None:
+        """Remember a verified payload until the token expires, for at most the cache TTL."""
+        expires_at = time.time() + VERIFIED_TOKEN_CACHE_TTL
+        exp = payload.get("exp")
+        if isinstance(exp, int | float):
+            expires_at = min(expires_at, exp)
+        if len(self._verified_tokens) >= VERIFIED_TOKEN_CACHE_SIZE:
+            # Dicts keep insertion order, so this evicts the oldest entry
+            del self._verified_tokens[next(iter(self._verified_tokens))]
+        self._verified_tokens[token] = (expires_at, dict(payload))
+
+    def _check_rate_limit(self, client_ip: str, method: str, path: str) -> None:
+        """Count a request from the client IP, raising 429 once over the limit."""
+        # Clearing all counts each window keeps memory bounded by the IPs seen per window
+        now = time.monotonic()
+        if now - self._rate_limit_window_start >= RATE_LIMIT_WINDOW:
+            self.rate_limit.clear()
+            self._rate_limit_window_start = now
+        count = self.rate_limit.get(client_ip, 0)
+        self.rate_limit[client_ip] = count + 1
+        if count > MAX_RATE_LIMIT_REQUESTS:
+            # Only the first rejection per IP and window is logged, so bursts add one line
+            if count == MAX_RATE_LIMIT_REQUESTS + 1:
                 logger.warning(
-                    "JWT does not meet conditions from %s for %s %s",
+                    "Rate limit exceeded from %s for %s %s; further rejections this window "
+                    "are not logged",
                     client_ip,
-                    request.method,
-                    request.url.path,
+                    method,
+                    path,
                 )
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="JWT does not meet conditions",
-                )
-
-        # Set forwarded header (mask token for logging)
-        masked_token = (
-            token[:TOKEN_MASK_LENGTH] + "..." if len(token) > TOKEN_MASK_LENGTH else token
-        )
-        request.headers.__dict__["_list"].append(
-            (self.forwarded_header.encode(), masked_token.encode())
-        )
-
-        # Set JWT in shared context for MCP tools
-        set_jwt_context(token, payload)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+            )
 
     def _check_condition(self, condition: str, payload: dict[str, Any]) -> bool:
         """Check simple conditions safely without eval."""
-        # Simple parser for common patterns: payload.field == value or payload_['field'] == value
-        if " == " in condition:
-            field, value = condition.split(" == ", 1)
-            field = field.strip()
-            value = value.strip().strip('"').strip("'")
-            if field.startswith("payload."):
-                key = field[8:]  # Remove "payload."
-                return payload.get(key) == value
-            if field.startswith("payload_['") and field.endswith("']"):
-                key = field[10:-2]  # Remove "payload_['" and "']"
-                return payload.get(key) == value
-        elif " in " in condition:
-            value, field = condition.split(" in ", 1)
-            value = value.strip().strip('"').strip("'")
-            field = field.strip()
-            if field.startswith("payload."):
-                key = field[8:]  # Remove "payload."
-                field_value = payload.get(key)
-                return isinstance(field_value, list) and value in field_value
-        elif ".endswith(" in condition and condition.endswith(")"):
-            parts = condition.split(".endswith(", 1)
-            if len(parts) == ENDSWITH_PARTS_COUNT and parts[0].startswith("payload."):
-                key = parts[0][8:]
-                suffix = parts[1].rstrip(")").strip('"').strip("'")
-                field_value = payload.get(key)
-                return isinstance(field_value, str) and field_value.endswith(suffix)
-        # Add more patterns as needed
-        logger.warning("Unsupported condition: %s", condition)
-        return False
+        return self._compile_condition(condition)(payload)
+
+    def _compile_condition(self, condition: str) -> ConditionCheck:
+        """Compile a condition into a check function, safely without eval."""
+        try:
+            return compile_condition(condition)
+        except UnsupportedConditionError:
+            logger.warning("Unsupported condition: %s", condition)
+            return lambda _: False
@@ -1,5 +1,6 @@
 """Tests for the AppConfig class."""
 
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 from mcp_app.app_config import AppConfig
@@ -32,16 +33,16 @@ def test_load_configuration_success(mock_logger: MagicMock, mock_load: MagicMock
     mock_logger.info.assert_called()
 
 
+@patch("mcp_app.app_config.CONFIG_PATHS", (Path("nonexistent.toml"),))
 @patch("mcp_app.app_config.load_config_from_file")
 @patch("mcp_app.app_config.logger")
 def test_load_configuration_file_not_found(mock_logger: MagicMock, mock_load: MagicMock) -> None:
     """Test configuration loading when file not found."""
-    mock_load.side_effect = FileNotFoundError
-
     config = AppConfig()
     config.load_configuration()
 
     assert config.config is None
+    mock_load.assert_not_called()
     mock_logger.error.assert_called()
 
 
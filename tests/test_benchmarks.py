@@ -5,7 +5,7 @@ from typing import Any
 
 import pytest
 
-from mcp_app.context import jwt_payload
+from mcp_app.context import JWTState, jwt_state
 from mcp_app.mcp_components.tools.hello_world import hello_world
 from mcp_app.mcp_components.tools.whoami import whoami
 
@@ -27,7 +27,7 @@ class TestBenchmarks:
         """Benchmark whoami tool performance."""
         # Mock payload for testing
         mock_payload = {"sub": "user123", "roles": ["admin"], "permissions": ["tool:admin"]}
-        jwt_payload.set(mock_payload)
+        jwt_state.set(JWTState(payload=mock_payload))
 
         def run_whoami() -> dict[str, Any] | str:
             return whoami()
@@ -1,18 +1,22 @@
 """Tests for the configuration module."""
 
-import os
 import tempfile
 from datetime import timedelta
 from pathlib import Path
 
 import pytest
-
-from mcp_app.config import Configuration, load_config_from_file, safe_expandvars
-
-
-def test_load_config_from_file_valid() -> None:
-    """Test loading a valid configuration file."""
-    config_data = """
+from pydantic import ValidationError
+
+from mcp_app.config import (
+    Configuration,
+    JWTValidationConfig,
+    clear_config_cache,
+    load_config_from_bytes,
+    load_config_from_file,
+    safe_expandvars,
+)
+
+VALID_CONFIG = b"""
 [server]
 name = "test-server"
 version = "1.0.0"
@@ -42,39 +46,35 @@ cache_interval = "PT1H"
 [[middleware.jwt.validation.local.allow_conditions]]
 expression = "user.roles contains 'admin'"
 """
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
-        f.write(config_data)
-        f.flush()
-        config_path = Path(f.name)
 
-    try:
-        config = load_config_from_file(config_path)
-        assert isinstance(config, Configuration)
-        assert config.server is not None
-        assert config.server.name == "test-server"
-        assert config.server.version == "1.0.0"
-        assert config.server.transport is not None
-        assert config.server.transport.type == "http"
-        assert config.server.transport.http is not None
-        assert config.server.transport.http.host == "localhost"
-        assert config.middleware is not None
-        assert config.middleware.access_logs.excluded_headers == ["Authorization"]
-        assert config.middleware.access_logs.redacted_headers == ["password"]
-        assert config.middleware.jwt is not None
-        assert config.middleware.jwt.enabled is True
-        assert config.middleware.jwt.validation is not None
-        assert config.middleware.jwt.validation.strategy == "local"
-        assert config.middleware.jwt.validation.forwarded_header == "X-Forwarded-User"
-        assert config.middleware.jwt.validation.local is not None
-        assert config.middleware.jwt.validation.local.jwks_uri == "https://example.com/jwks"
-        assert config.middleware.jwt.validation.local.cache_interval == timedelta(hours=1)
-        assert len(config.middleware.jwt.validation.local.allow_conditions) == 1
-        assert (
-            config.middleware.jwt.validation.local.allow_conditions[0].expression
-            == "user.roles contains 'admin'"
-        )
-    finally:
-        config_path.unlink()
+
+def test_load_config_from_bytes_valid() -> None:
+    """Test parsing a valid configuration."""
+    config = load_config_from_bytes(VALID_CONFIG)
+    assert isinstance(config, Configuration)
+    assert config.server is not None
+    assert config.server.name == "test-server"
+    assert config.server.version == "1.0.0"
+    assert config.server.transport is not None
+    assert config.server.transport.type == "http"
+    assert config.server.transport.http is not None
+    assert config.server.transport.http.host == "localhost"
+    assert config.middleware is not None
+    assert config.middleware.access_logs.excluded_headers == ["Authorization"]
+    assert config.middleware.access_logs.redacted_headers == ["password"]
+    assert config.middleware.jwt is not None
+    assert config.middleware.jwt.enabled is True
+    assert config.middleware.jwt.validation is not None
+    assert config.middleware.jwt.validation.strategy == "local"
+    assert config.middleware.jwt.validation.forwarded_header == "X-Forwarded-User"
+    assert config.middleware.jwt.validation.local is not None
+    assert config.middleware.jwt.validation.local.jwks_uri == "https://example.com/jwks"
+    assert config.middleware.jwt.validation.local.cache_interval == timedelta(hours=1)
+    assert len(config.middleware.jwt.validation.local.allow_conditions) == 1
+    assert (
+        config.middleware.jwt.validation.local.allow_conditions[0]["expression"]
+        == "user.roles contains 'admin'"
+    )
 
 
 def test_load_config_from_file_file_not_found() -> None:
@@ -86,43 +86,70 @@ def test_load_config_from_file_file_not_found() -> None:
         load_config_from_file("nonexistent.toml")
 
 
+def test_load_config_from_file_cached() -> None:
+    """Test that an unchanged file is served from the cache until cleared."""
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".toml", delete=False) as f:
+        f.write('[server]\nname = "cached"\nversion = "1.0.0"\n')
+        f.flush()
+        config_path = Path(f.name)
+
+    try:
+        first = load_config_from_file(config_path)
+        assert load_config_from_file(config_path) is first
+        clear_config_cache()
+        assert load_config_from_file(config_path) is not first
+    finally:
+        config_path.unlink()
+        clear_config_cache()
+
+
 def test_jwt_exposed_claims_default() -> None:
     """Test that jwt_exposed_claims defaults to 'all'."""
     config = Configuration()
     assert config.jwt_exposed_claims == "all"
 
 
-def test_jwt_exposed_claims_custom_list() -> None:
-    """Test setting jwt_exposed_claims to a custom list."""
-    config = Configuration(jwt_exposed_claims=["user_id", "roles"])
-    assert config.jwt_exposed_claims == ["user_id", "roles"]
+def test_configuration_is_frozen() -> None:
+    """Test that loaded configuration cannot be mutated."""
+    config = Configuration()
+    with pytest.raises(ValidationError):
+        config.jwt_exposed_claims = ["sub"]
 
 
-def test_safe_expandvars_allowed() -> None:
-    """Test safe_expandvars with allowed variables."""
-    os.environ["TEST_VAR"] = "expanded_value"
-    try:
-        result = safe_expandvars("${TEST_VAR}", {"TEST_VAR"})
-        assert result == "expanded_value"
-    finally:
-        del os.environ["TEST_VAR"]
+def test_jwt_validation_strategy_rejects_unknown() -> None:
+    """Test that an unknown JWT validation strategy fails config validation."""
+    with pytest.raises(ValidationError):
+        JWTValidationConfig.model_validate({"strategy": "remote"})
 
 
-def test_safe_expandvars_blocked() -> None:
-    """Test safe_expandvars with blocked variables."""
-    os.environ["BLOCKED_VAR"] = "blocked_content"
-    try:
-        result = safe_expandvars("${BLOCKED_VAR}", {"TEST_VAR"})
-        assert result == "${BLOCKED_VAR}"  # Should not expand
-    finally:
-        del os.environ["BLOCKED_VAR"]
+def test_jwt_exposed_claims_custom_list() -> None:
+    """Test setting jwt_exposed_claims to a custom list."""
+    config = Configuration(jwt_exposed_claims=["user_id", "roles"])
+    assert config.jwt_exposed_claims == ["user_id", "roles"]
 
 
-def test_safe_expandvars_no_restriction() -> None:
-    """Test safe_expandvars without restrictions."""
-    os.environ["ANY_VAR"] = "any_value"
-    try:
-        result = safe_expandvars("${ANY_VAR}")
-        assert result == "any_value"
-    finally:
-        del os.environ["ANY_VAR"]
+@pytest.mark.parametrize(
+    ("name", "value", "allowed_vars", "expected"),
+    [
+        ("TEST_VAR", "expanded_value", {"TEST_VAR"}, "expanded_value"),
+        ("BLOCKED_VAR", "blocked_content", {"TEST_VAR"}, "${BLOCKED_VAR}"),
+        ("ANY_VAR", "any_value", None, "any_value"),
+    ],
+    ids=["allowed", "blocked", "no_restriction"],
+)
+def test_safe_expandvars(
+    monkeypatch: pytest.MonkeyPatch,
+    name: str,
+    value: str,
+    allowed_vars: set[str] | None,
+    expected: str,
+) -> None:
+    """Test that safe_expandvars only expands allowed variables."""
+    monkeypatch.setenv(name, value)
+    assert safe_expandvars(f"${{{name}}}", allowed_vars) == expected
+
+
+def test_safe_expandvars_no_references() -> None:
+    """Test safe_expandvars returns content untouched when there is nothing to expand."""
+    content = 'name = "plain"'
+    assert safe_expandvars(content, {"TEST_VAR"}) is content
@@ -1,33 +1,53 @@
 """Tests for the FastAPIApp class."""
 
-from unittest.mock import MagicMock
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import pytest
 from fastapi.testclient import TestClient
 
+from mcp_app import context
 from mcp_app.app_config import AppConfig
-from mcp_app.config import ServerConfig
+from mcp_app.config import (
+    AccessLogsConfig,
+    Configuration,
+    JWTConfig,
+    JWTValidationConfig,
+    JWTValidationLocalConfig,
+    MiddlewareConfig,
+    ServerConfig,
+)
+from mcp_app.context import JWTContextConfig
 from mcp_app.fastapi_app import FastAPIApp
 from mcp_app.mcp_server import MCPServer
+from mcp_app.middlewares.jwt_validation import JWKSCache
 
 HTTP_200_OK = 200
 
 
 def test_fastapi_app_init() -> None:
     """Test FastAPIApp initialization."""
-    config = MagicMock()
-    mcp = MagicMock()
+    config = Configuration()
+    mcp = MagicMock()  # Only needs to provide streamable_http_app()
     app = FastAPIApp(config, mcp)
-    assert app.config == config
-    assert app.mcp == mcp
+    assert app.config is config
+    assert app.mcp is mcp
     assert app.app is not None
 
 
+def test_fastapi_app_init_sets_exposed_claims(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test FastAPIApp applies the exposed claims config without running the lifespan."""
+    # A fresh singleton, restored by monkeypatch even if an assertion fails
+    monkeypatch.setattr(context, "jwt_context_config", JWTContextConfig())
+    config = Configuration(jwt_exposed_claims=["sub"])
+    FastAPIApp(config, MCPServer().mcp)
+    assert context.jwt_context_config.exposed_claims == ["sub"]
+
+
 def test_read_root_with_config() -> None:
     """Test read_root endpoint with config."""
-    mock_config = MagicMock()
-    mock_config.server = ServerConfig(name="TestServer", version="1.0")
     test_app_config = AppConfig()
-    test_app_config._config = mock_config
+    test_app_config._config = Configuration(server=ServerConfig(name="TestServer", version="1.0"))
     test_mcp_server = MCPServer()
     test_fastapi_app = FastAPIApp(test_app_config.config, test_mcp_server.mcp)
     client = TestClient(test_fastapi_app.app)
@@ -36,25 +56,46 @@ def test_read_root_with_config() -> None:
     assert "Hello from TestServer" in response.json()["message"]
 
 
-def test_read_root_without_config() -> None:
-    """Test read_root endpoint without config."""
+@pytest.fixture(scope="module")
+def unconfigured_client() -> TestClient:
+    """Client for an app built without configuration, shared by the module's tests."""
     test_app_config = AppConfig()
     test_app_config._config = None
-    test_mcp_server = MCPServer()
-    test_fastapi_app = FastAPIApp(test_app_config.config, test_mcp_server.mcp)
-    client = TestClient(test_fastapi_app.app)
-    response = client.get("/")
+    test_fastapi_app = FastAPIApp(test_app_config.config, MCPServer().mcp)
+    return TestClient(test_fastapi_app.app)
+
+
+def test_read_root_without_config(unconfigured_client: TestClient) -> None:
+    """Test read_root endpoint without config."""
+    response = unconfigured_client.get("/")
     assert response.status_code == HTTP_200_OK
     assert "Hello from Unknown" in response.json()["message"]
 
 
-def test_health_check() -> None:
+def test_health_check(unconfigured_client: TestClient) -> None:
     """Test health check endpoint."""
-    test_app_config = AppConfig()
-    test_app_config._config = None
-    test_mcp_server = MCPServer()
-    test_fastapi_app = FastAPIApp(test_app_config.config, test_mcp_server.mcp)
-    client = TestClient(test_fastapi_app.app)
-    response = client.get("/health")
+    response = unconfigured_client.get("/health")
     assert response.status_code == HTTP_200_OK
     assert response.json() == {"status": "ok"}
+
+
+def test_lifespan_closes_jwks_cache() -> None:
+    """Test the app lifespan closes the JWKS cache used for local JWT validation."""
+    local = JWTValidationLocalConfig(
+        jwks_uri="https://example.com/jwks", cache_interval=timedelta(minutes=5)
+    )
+    config = Configuration(
+        middleware=MiddlewareConfig(
+            access_logs=AccessLogsConfig(),
+            jwt=JWTConfig(
+                enabled=True, validation=JWTValidationConfig(strategy="local", local=local)
+            ),
+        )
+    )
+    fastapi_app = FastAPIApp(config, MCPServer().mcp)
+    assert fastapi_app._jwks_cache is not None
+
+    with patch.object(JWKSCache, "aclose", new_callable=AsyncMock) as mock_aclose:
+        with TestClient(fastapi_app.app):
+            mock_aclose.assert_not_awaited()
+        mock_aclose.assert_awaited_once()
@@ -1,6 +1,7 @@
 """Tests for the handlers module."""
 
-from unittest.mock import AsyncMock, MagicMock, Mock, patch
+import json
+from unittest.mock import patch
 
 import httpx
 import pytest
@@ -9,11 +10,86 @@ from fastapi import HTTPException
 from mcp_app.config import Configuration, OAuthAuthorizationServer, OAuthProtectedResourceConfig
 from mcp_app.handlers.handlers import HandlersManager
 
+HTTP_304_NOT_MODIFIED = 304
 HTTP_403_FORBIDDEN = 403
 
 HTTP_404_NOT_FOUND = 404
 HTTP_500_INTERNAL_SERVER_ERROR = 500
 
+OPENID_CONFIG_URL = "https://example.com/.well-known/openid-configuration"
+AUTH_SERVER_CONFIG = Configuration(
+    oauth_authorization_server=OAuthAuthorizationServer(
+        enabled=True, issuer_uri="https://example.com"
+    )
+)
+
+NO_WHITELIST_CONFIG = Configuration(oauth_whitelist_domains=[])
+EXAMPLE_WHITELIST_CONFIG = Configuration(oauth_whitelist_domains=["example.com"])
+
+PROTECTED_RESOURCE_CONFIG = OAuthProtectedResourceConfig(
+    enabled=True,
+    resource="https://api.example.com",
+    auth_servers=["https://auth.example.com"],
+    jwks_uri="https://auth.example.com/jwks",
+    scopes_supported=["read", "write"],
+    bearer_methods_supported=["Bearer"],
+    resource_signing_alg_values_supported=["RS256"],
+    resource_name="Example API",
+    resource_documentation="https://docs.example.com",
+    resource_policy_uri="https://policy.example.com",
+    resource_tos_uri="https://tos.example.com",
+    tls_client_certificate_bound_access_tokens=True,
+    authorization_details_types_supported=["type1"],
+    dpop_signing_alg_values_supported=["ES256"],
+    dpop_bound_access_tokens_required=True,
+)
+PROTECTED_RESOURCE_METADATA = {
+    "resource": "https://api.example.com",
+    "authorization_servers": ["https://auth.example.com"],
+    "jwks_uri": "https://auth.example.com/jwks",
+    "scopes_supported": ["read", "write"],
+    "bearer_methods_supported": ["Bearer"],
+    "resource_signing_alg_values_supported": ["RS256"],
+    "resource_name": "Example API",
+    "resource_documentation": "https://docs.example.com",
+    "resource_policy_uri": "https://policy.example.com",
+    "resource_tos_uri": "https://tos.example.com",
+    "tls_client_certificate_bound_access_tokens": True,
+    "authorization_details_types_supported": ["type1"],
+    "dpop_signing_alg_values_supported": ["ES256"],
+    "dpop_bound_access_tokens_required": True,
+}
+
+
+class MockHTTP:
+    """Canned HTTP responses keyed by URL, served through an httpx mock transport."""
+
+    def __init__(self) -> None:
+        """Initialize with no responses and no recorded requests."""
+        self.responses: dict[str, httpx.Response | httpx.HTTPError] = {}
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        """Record the request and return, or raise, its canned response."""
+        self.requests.append(request)
+        response = self.responses[str(request.url)]
+        if isinstance(response, httpx.HTTPError):
+            raise response
+        return response
+
+
+@pytest.fixture
+def mock_http(monkeypatch: pytest.MonkeyPatch) -> MockHTTP:
+    """Route the one-off clients HandlersManager creates through a mock transport."""
+    mock = MockHTTP()
+    transport = httpx.MockTransport(mock.handler)
+    client_class = httpx.AsyncClient
+    monkeypatch.setattr(
+        "mcp_app.handlers.handlers.httpx.AsyncClient",
+        lambda **kwargs: client_class(transport=transport, **kwargs),
+    )
+    return mock
+
 
 def test_handlers_manager_init() -> None:
     """Test HandlersManager initialization."""
@@ -22,7 +98,6 @@ def test_handlers_manager_init() -> None:
     assert manager.config == config
 
 
-@pytest.mark.asyncio
 async def test_handle_oauth_authorization_server_disabled() -> None:
     """Test handle_oauth_authorization_server when disabled."""
     config = Configuration(
@@ -35,44 +110,48 @@ async def test_handle_oauth_authorization_server_disabled() -> None:
     assert "OAuth authorization server not enabled" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.handlers.handlers.httpx.AsyncClient")
-async def test_handle_oauth_authorization_server_success(mock_client_class: MagicMock) -> None:
+async def test_handle_oauth_authorization_server_success(mock_http: MockHTTP) -> None:
     """Test handle_oauth_authorization_server successful response."""
-    mock_response = Mock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.json.return_value = {"test": "data"}
+    mock_http.responses[OPENID_CONFIG_URL] = httpx.Response(200, json={"test": "data"})
+    manager = HandlersManager(AUTH_SERVER_CONFIG)
 
-    mock_client = AsyncMock()
-    mock_client.get.return_value = mock_response
-    mock_client_class.return_value.__aenter__.return_value = mock_client
+    result = await manager.handle_oauth_authorization_server()
+    assert result == {"test": "data"}
+    assert [str(request.url) for request in mock_http.requests] == [OPENID_CONFIG_URL]
 
-    config = Configuration(
-        oauth_authorization_server=OAuthAuthorizationServer(
-            enabled=True, issuer_uri="https://example.com"
-        )
-    )
-    manager = HandlersManager(config)
 
-    result = await manager.handle_oauth_authorization_server()
+async def test_handle_oauth_authorization_server_shared_client() -> None:
+    """Test handle_oauth_authorization_server uses the shared client when set."""
+    shared = MockHTTP()
+    shared.responses[OPENID_CONFIG_URL] = httpx.Response(200, json={"test": "data"})
+    manager = HandlersManager(AUTH_SERVER_CONFIG)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(shared.handler)) as client:
+        manager.http_client = client
+        result = await manager.handle_oauth_authorization_server()
     assert result == {"test": "data"}
-    mock_client.get.assert_called_once_with("https://example.com/.well-known/openid-configuration")
+    assert len(shared.requests) == 1
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.handlers.handlers.httpx.AsyncClient")
-async def test_handle_oauth_authorization_server_http_error(mock_client_class: MagicMock) -> None:
-    """Test handle_oauth_authorization_server with HTTP error."""
-    mock_client = AsyncMock()
-    mock_client.get.side_effect = httpx.HTTPError("Network error")
-    mock_client_class.return_value.__aenter__.return_value = mock_client
+async def test_handle_oauth_authorization_server_cached(mock_http: MockHTTP) -> None:
+    """Test handle_oauth_authorization_server serves repeated calls from cache."""
+    mock_http.responses[OPENID_CONFIG_URL] = httpx.Response(200, json={"test": "data"})
+    manager = HandlersManager(AUTH_SERVER_CONFIG)
 
-    config = Configuration(
-        oauth_authorization_server=OAuthAuthorizationServer(
-            enabled=True, issuer_uri="https://example.com"
-        )
-    )
-    manager = HandlersManager(config)
+    assert await manager.handle_oauth_authorization_server() == {"test": "data"}
+    assert await manager.handle_oauth_authorization_server() == {"test": "data"}
+    assert len(mock_http.requests) == 1
+
+    # Expired entries are fetched again
+    with patch("mcp_app.handlers.handlers.OPENID_CONFIG_CACHE_TTL", 0):
+        await manager.handle_oauth_authorization_server()
+    assert len(mock_http.requests) == 2  # noqa: PLR2004
+
+
+async def test_handle_oauth_authorization_server_http_error(mock_http: MockHTTP) -> None:
+    """Test handle_oauth_authorization_server with HTTP error."""
+    mock_http.responses[OPENID_CONFIG_URL] = httpx.ConnectError("Network error")
+    manager = HandlersManager(AUTH_SERVER_CONFIG)
 
     with pytest.raises(HTTPException) as exc_info:
         await manager.handle_oauth_authorization_server()
@@ -80,7 +159,6 @@ async def test_handle_oauth_authorization_server_http_error(mock_client_class: M
     assert "Error fetching OpenID config" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
 async def test_handle_oauth_protected_resources_disabled() -> None:
     """Test handle_oauth_protected_resources when disabled."""
     config = Configuration(
@@ -95,71 +173,38 @@ async def test_handle_oauth_protected_resources_disabled() -> None:
     assert "OAuth protected resource not enabled" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
 async def test_handle_oauth_protected_resources_success() -> None:
     """Test handle_oauth_protected_resources successful response."""
-    pr_config = OAuthProtectedResourceConfig(
-        enabled=True,
-        resource="https://api.example.com",
-        auth_servers=["https://auth.example.com"],
-        jwks_uri="https://auth.example.com/jwks",
-        scopes_supported=["read", "write"],
-        bearer_methods_supported=["Bearer"],
-        resource_signing_alg_values_supported=["RS256"],
-        resource_name="Example API",
-        resource_documentation="https://docs.example.com",
-        resource_policy_uri="https://policy.example.com",
-        resource_tos_uri="https://tos.example.com",
-        tls_client_certificate_bound_access_tokens=True,
-        authorization_details_types_supported=["type1"],
-        dpop_signing_alg_values_supported=["ES256"],
-        dpop_bound_access_tokens_required=True,
-    )
-    config = Configuration(oauth_protected_resource=pr_config)
-    manager = HandlersManager(config)
+    manager = HandlersManager(Configuration(oauth_protected_resource=PROTECTED_RESOURCE_CONFIG))
 
     result = await manager.handle_oauth_protected_resources()
-    expected = {
-        "resource": "https://api.example.com",
-        "authorization_servers": ["https://auth.example.com"],
-        "jwks_uri": "https://auth.example.com/jwks",
-        "scopes_supported": ["read", "write"],
-        "bearer_methods_supported": ["Bearer"],
-        "resource_signing_alg_values_supported": ["RS256"],
-        "resource_name": "Example API",
-        "resource_documentation": "https://docs.example.com",
-        "resource_policy_uri": "https://policy.example.com",
-        "resource_tos_uri": "https://tos.example.com",
-        "tls_client_certificate_bound_access_tokens": True,
-        "authorization_details_types_supported": ["type1"],
-        "dpop_signing_alg_values_supported": ["ES256"],
-        "dpop_bound_access_tokens_required": True,
-    }
-    assert result == expected
-
+    assert result.media_type == "application/json"
+    assert json.loads(bytes(result.body)) == PROTECTED_RESOURCE_METADATA
+
+    # Revalidation with the returned ETag gets a bodiless 304
+    etag = result.headers["etag"]
+    not_modified = await manager.handle_oauth_protected_resources(f'W/"other", {etag}')
+    assert not_modified.status_code == HTTP_304_NOT_MODIFIED
+    assert not_modified.body == b""
+    assert not_modified.headers["etag"] == etag
+    stale = await manager.handle_oauth_protected_resources('"other"')
+    assert json.loads(bytes(stale.body)) == PROTECTED_RESOURCE_METADATA
+
+
+@pytest.mark.parametrize(
+    ("config", "uri", "expected"),
+    [
+        (NO_WHITELIST_CONFIG, "https://example.com", True),
+        (EXAMPLE_WHITELIST_CONFIG, "https://sub.example.com", True),
+        (EXAMPLE_WHITELIST_CONFIG, "https://bad.com", False),
+    ],
+    ids=["no_whitelist", "allowed_domain", "blocked_domain"],
+)
+def test_is_uri_allowed(config: Configuration, uri: str, *, expected: bool) -> None:
+    """Test _is_uri_allowed against the OAuth domain whitelist."""
+    assert HandlersManager(config)._is_uri_allowed(uri) is expected
 
-def test_is_uri_allowed_no_whitelist() -> None:
-    """Test _is_uri_allowed with no whitelist."""
-    config = Configuration(oauth_whitelist_domains=[])
-    manager = HandlersManager(config)
-    assert manager._is_uri_allowed("https://example.com") is True
-
-
-def test_is_uri_allowed_allowed_domain() -> None:
-    """Test _is_uri_allowed with allowed domain."""
-    config = Configuration(oauth_whitelist_domains=["example.com"])
-    manager = HandlersManager(config)
-    assert manager._is_uri_allowed("https://sub.example.com") is True
 
-
-def test_is_uri_allowed_blocked_domain() -> None:
-    """Test _is_uri_allowed with blocked domain."""
-    config = Configuration(oauth_whitelist_domains=["example.com"])
-    manager = HandlersManager(config)
-    assert manager._is_uri_allowed("https://bad.com") is False
-
-
-@pytest.mark.asyncio
 async def test_handle_oauth_authorization_server_uri_blocked() -> None:
     """Test handle_oauth_authorization_server with blocked URI."""
     config = Configuration(
@@ -175,28 +220,17 @@ async def test_handle_oauth_authorization_server_uri_blocked() -> None:
     assert "Issuer URI not in allowed domains" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.handlers.handlers.httpx.AsyncClient")
-async def test_handle_oauth_authorization_server_sanitized(mock_client_class: MagicMock) -> None:
+async def test_handle_oauth_authorization_server_sanitized(mock_http: MockHTTP) -> None:
     """Test handle_oauth_authorization_server sanitizes response."""
-    mock_response = Mock()
-    mock_response.raise_for_status.return_value = None
-    mock_response.json.return_value = {
-        "issuer": "https://example.com",
-        "private_key_jwt": "secret",  # Should be removed
-        "authorization_endpoint": "https://example.com/auth",
-    }
-
-    mock_client = AsyncMock()
-    mock_client.get.return_value = mock_response
-    mock_client_class.return_value.__aenter__.return_value = mock_client
-
-    config = Configuration(
-        oauth_authorization_server=OAuthAuthorizationServer(
-            enabled=True, issuer_uri="https://example.com"
-        )
+    mock_http.responses[OPENID_CONFIG_URL] = httpx.Response(
+        200,
+        json={
+            "issuer": "https://example.com",
+            "private_key_jwt": "secret",  # Should be removed
+            "authorization_endpoint": "https://example.com/auth",
+        },
     )
-    manager = HandlersManager(config)
+    manager = HandlersManager(AUTH_SERVER_CONFIG)
 
     result = await manager.handle_oauth_authorization_server()
     expected = {
@@ -206,9 +240,8 @@ async def test_handle_oauth_authorization_server_sanitized(mock_client_class: Ma
     assert result == expected
 
 
-@pytest.mark.asyncio
-async def test_handle_oauth_protected_resources_uri_blocked() -> None:
-    """Test handle_oauth_protected_resources with blocked URI."""
+def test_handle_oauth_protected_resources_uri_blocked() -> None:
+    """Test HandlersManager rejects protected resource config with blocked URI at startup."""
     pr_config = OAuthProtectedResourceConfig(
         enabled=True,
         resource="https://api.example.com",
@@ -219,16 +252,12 @@ async def test_handle_oauth_protected_resources_uri_blocked() -> None:
     config = Configuration(
         oauth_protected_resource=pr_config, oauth_whitelist_domains=["example.com"]
     )
-    manager = HandlersManager(config)
-    with pytest.raises(HTTPException) as exc_info:
-        await manager.handle_oauth_protected_resources()
-    assert exc_info.value.status_code == HTTP_403_FORBIDDEN
-    assert "Auth server URI not allowed" in str(exc_info.value.detail)
+    with pytest.raises(ValueError, match="Auth server URI not allowed"):
+        HandlersManager(config)
 
 
-@pytest.mark.asyncio
-async def test_handle_oauth_protected_resources_jwks_uri_blocked() -> None:
-    """Test handle_oauth_protected_resources with blocked JWKS URI."""
+def test_handle_oauth_protected_resources_jwks_uri_blocked() -> None:
+    """Test HandlersManager rejects protected resource config with blocked JWKS URI at startup."""
     pr_config = OAuthProtectedResourceConfig(
         enabled=True,
         resource="https://api.example.com",
@@ -239,8 +268,5 @@ async def test_handle_oauth_protected_resources_jwks_uri_blocked() -> None:
     config = Configuration(
         oauth_protected_resource=pr_config, oauth_whitelist_domains=["example.com"]
     )
-    manager = HandlersManager(config)
-    with pytest.raises(HTTPException) as exc_info:
-        await manager.handle_oauth_protected_resources()
-    assert exc_info.value.status_code == HTTP_403_FORBIDDEN
-    assert "JWKS URI not allowed" in str(exc_info.value.detail)
+    with pytest.raises(ValueError, match="JWKS URI not allowed"):
+        HandlersManager(config)
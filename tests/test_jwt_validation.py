@@ -1,19 +1,55 @@
 """Tests for JWT validation middleware."""
 
+import asyncio
 import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import jwt
 import pytest
 from fastapi import HTTPException
+from starlette.types import Scope
 
-from mcp_app.middlewares.jwt_validation import JWKSCache, JWTValidationMiddleware
+from mcp_app.middlewares.jwt_validation import (
+    RATE_LIMIT_WINDOW,
+    UNKNOWN_KID_REFRESH_INTERVAL,
+    JWKSCache,
+    JWTValidationMiddleware,
+    get_unverified_header,
+)
 
 HTTP_401_UNAUTHORIZED = 401
 HTTP_429_TOO_MANY_REQUESTS = 429
 CACHE_INTERVAL_DEFAULT = 600
 
 
+def make_scope(
+    method: str = "GET", headers: dict[str, str] | None = None, client: str = "127.0.0.1"
+) -> Scope:
+    """Build a minimal HTTP scope for middleware tests."""
+    return {
+        "type": "http",
+        "method": method,
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": (client, 12345),
+        "path": "/mcp",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+
+
+def test_get_unverified_header() -> None:
+    """Test get_unverified_header matches PyJWT and rejects malformed tokens."""
+    token = jwt.encode({"sub": "user"}, "secret", algorithm="HS256", headers={"kid": "key1"})
+    assert get_unverified_header(token) == jwt.get_unverified_header(token)
+
+    for malformed in ["", "no-segments", "!!!.payload.sig", "WzFd.payload.sig"]:
+        with pytest.raises(jwt.DecodeError):
+            get_unverified_header(malformed)
+
+
 def test_jwks_cache_init() -> None:
     """Test JWKSCache initialization."""
     cache = JWKSCache("https://example.com/jwks", CACHE_INTERVAL_DEFAULT)
@@ -23,53 +59,162 @@ def test_jwks_cache_init() -> None:
     assert cache.last_updated == 0
 
 
-@patch("mcp_app.middlewares.jwt_validation.requests.get")
-def test_jwks_cache_refresh_keys_success(mock_get: MagicMock) -> None:
+@patch("mcp_app.middlewares.jwt_validation.httpx.AsyncClient")
+async def test_jwks_cache_refresh_keys_success(mock_client_class: MagicMock) -> None:
     """Test JWKSCache _refresh_keys success."""
-    mock_response = MagicMock()
-    mock_response.json.return_value = {"keys": [{"kid": "key1", "kty": "RSA"}]}
-    mock_get.return_value = mock_response
+    request = httpx.Request("GET", "https://example.com/jwks")
+    mock_response = httpx.Response(
+        200, json={"keys": [{"kid": "key1", "kty": "RSA"}]}, request=request
+    )
+    mock_client = mock_client_class.return_value
+    mock_client.get = AsyncMock(return_value=mock_response)
+    mock_client.aclose = AsyncMock()
 
     cache = JWKSCache("https://example.com/jwks")
-    cache._refresh_keys()
+    await cache._refresh_keys()
 
     assert cache.keys == {"key1": {"kid": "key1", "kty": "RSA"}}
     assert cache.last_updated > 0
 
+    # Later refreshes reuse the same client
+    cache.last_updated = 0.0
+    await cache._refresh_keys()
+    mock_client_class.assert_called_once()
+    assert mock_client.get.await_count == 2  # noqa: PLR2004
+
+    await cache.aclose()
+    mock_client.aclose.assert_awaited_once()
+
+
+@patch("mcp_app.middlewares.jwt_validation.httpx.AsyncClient")
+async def test_jwks_cache_refresh_keys_not_modified(mock_client_class: MagicMock) -> None:
+    """Test JWKSCache revalidates with the ETag and honors Cache-Control max-age."""
+    request = httpx.Request("GET", "https://example.com/jwks")
+    headers = {"ETag": '"v1"', "Cache-Control": "public, max-age=600"}
+    mock_client = mock_client_class.return_value
+    mock_client.get = AsyncMock(
+        side_effect=[
+            httpx.Response(200, json={"keys": [{"kid": "key1"}]}, headers=headers, request=request),
+            httpx.Response(304, headers=headers, request=request),
+        ]
+    )
+
+    cache = JWKSCache("https://example.com/jwks", CACHE_INTERVAL_DEFAULT)
+    await cache._refresh_keys()
+    assert cache.cache_interval == 600  # noqa: PLR2004
+
+    cache.last_updated = 0.0
+    await cache._refresh_keys()
 
-@patch("mcp_app.middlewares.jwt_validation.requests.get")
-def test_jwks_cache_refresh_keys_failure(mock_get: MagicMock) -> None:
+    assert mock_client.get.await_args is not None
+    assert mock_client.get.await_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+    assert cache.keys == {"key1": {"kid": "key1"}}
+    assert cache.last_updated > 0
+
+
+@patch("mcp_app.middlewares.jwt_validation.httpx.AsyncClient")
+async def test_jwks_cache_refresh_keys_failure(mock_client_class: MagicMock) -> None:
     """Test JWKSCache _refresh_keys failure."""
-    mock_get.side_effect = Exception("Network error")
+    mock_client = mock_client_class.return_value
+    mock_client.get = AsyncMock(side_effect=httpx.ConnectError("Network error"))
 
     cache = JWKSCache("https://example.com/jwks")
-    cache._refresh_keys()
+    await cache._refresh_keys()
 
     assert cache.keys == {}
     assert cache.last_updated == 0
 
 
-def test_jwks_cache_get_key_no_refresh() -> None:
+async def test_jwks_cache_get_key_no_refresh() -> None:
     """Test JWKSCache get_key without refresh."""
     cache = JWKSCache("https://example.com/jwks")
     cache.keys = {"key1": {"kid": "key1"}}
     cache.last_updated = time.time()
 
-    key = cache.get_key("key1")
+    key = await cache.get_key("key1")
     assert key == {"kid": "key1"}
 
 
 @patch.object(JWKSCache, "_refresh_keys")
-def test_jwks_cache_get_key_with_refresh(mock_refresh: MagicMock) -> None:
-    """Test JWKSCache get_key with refresh."""
+async def test_jwks_cache_get_key_with_refresh(mock_refresh: AsyncMock) -> None:
+    """Test JWKSCache get_key waits for a refresh when no keys are cached."""
     cache = JWKSCache("https://example.com/jwks", 0)  # Short interval
     cache.last_updated = 0
 
-    key = cache.get_key("key1")
-    mock_refresh.assert_called_once()
+    key = await cache.get_key("key1")
+    mock_refresh.assert_awaited_once()
     assert key is None
 
 
+async def test_jwks_cache_get_key_serves_stale_keys() -> None:
+    """Test JWKSCache get_key returns stale keys while refreshing in the background."""
+    cache = JWKSCache("https://example.com/jwks", CACHE_INTERVAL_DEFAULT)
+    cache.keys = {"key1": {"kid": "key1"}}
+    cache.last_updated = time.time() - CACHE_INTERVAL_DEFAULT - 1  # Stale, not expired
+    refreshed = asyncio.Event()
+
+    async def refresh() -> None:
+        refreshed.set()
+
+    with patch.object(JWKSCache, "_refresh_keys", side_effect=refresh) as mock_refresh:
+        key = await cache.get_key("key1")
+        assert key == {"kid": "key1"}
+        await asyncio.wait_for(refreshed.wait(), timeout=1)
+        mock_refresh.assert_called_once()
+
+
+@patch("mcp_app.middlewares.jwt_validation.httpx.AsyncClient")
+async def test_jwks_cache_get_key_unknown_kid_refreshes(mock_client_class: MagicMock) -> None:
+    """Test JWKSCache get_key refetches for an unknown kid, at most once per interval."""
+    request = httpx.Request("GET", "https://example.com/jwks")
+    keys = [{"kid": "key1"}, {"kid": "key2"}]
+    mock_client = mock_client_class.return_value
+    mock_client.get = AsyncMock(
+        return_value=httpx.Response(200, json={"keys": keys}, request=request)
+    )
+
+    cache = JWKSCache("https://example.com/jwks", CACHE_INTERVAL_DEFAULT)
+    cache.keys = {"key1": {"kid": "key1"}}
+    cache.last_updated = time.time()
+
+    assert await cache.get_key("key2") == {"kid": "key2"}
+    assert await cache.get_key("unknown") is None
+    mock_client.get.assert_awaited_once()
+
+
+@patch("mcp_app.middlewares.jwt_validation.httpx.AsyncClient")
+async def test_jwks_cache_get_key_unknown_kid_throttled_on_failure(
+    mock_client_class: MagicMock,
+) -> None:
+    """Test JWKSCache get_key does not refetch per unknown kid while the endpoint fails."""
+    mock_client = mock_client_class.return_value
+    mock_client.get = AsyncMock(side_effect=httpx.ConnectError("Network error"))
+
+    cache = JWKSCache("https://example.com/jwks", CACHE_INTERVAL_DEFAULT)
+    cache.keys = {"key1": {"kid": "key1"}}
+    cache.last_updated = time.time() - UNKNOWN_KID_REFRESH_INTERVAL - 1
+
+    assert await cache.get_key("key2") is None
+    assert await cache.get_key("key3") is None
+    mock_client.get.assert_awaited_once()
+    assert cache.keys == {"key1": {"kid": "key1"}}
+
+
+@patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
+async def test_jwks_cache_get_jwk_cached(mock_pyjwk: MagicMock) -> None:
+    """Test JWKSCache get_jwk parses each JWK once until the next refresh."""
+    cache = JWKSCache("https://example.com/jwks")
+    cache.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    cache.last_updated = time.time()
+
+    first = await cache.get_jwk("key1")
+    second = await cache.get_jwk("key1")
+
+    assert first is second is mock_pyjwk.return_value
+    mock_pyjwk.assert_called_once_with({"kid": "key1", "kty": "RSA"})
+    assert await cache.get_jwk("missing") is None
+
+
 def test_jwt_validation_middleware_init_external() -> None:
     """Test JWTValidationMiddleware init with external strategy."""
     middleware = JWTValidationMiddleware(MagicMock(), strategy="external")
@@ -87,6 +232,21 @@ def test_jwt_validation_middleware_init_local() -> None:
     assert middleware.jwks.uri == "https://example.com/jwks"
 
 
+def test_jwt_validation_middleware_init_shared_jwks_cache() -> None:
+    """Test JWTValidationMiddleware uses a JWKS cache passed in by its owner."""
+    cache = JWKSCache("https://example.com/jwks")
+    middleware = JWTValidationMiddleware(
+        MagicMock(), strategy="local", jwks_uri="https://example.com/jwks", jwks_cache=cache
+    )
+    assert middleware.jwks is cache
+
+
+def test_jwt_validation_middleware_init_local_no_jwks() -> None:
+    """Test JWTValidationMiddleware init rejects the local strategy without a JWKS URI."""
+    with pytest.raises(ValueError, match=r"Local JWT validation requires a JWKS URI"):
+        JWTValidationMiddleware(MagicMock(), strategy="local")
+
+
 def test_jwt_validation_middleware_init_local_blocked_uri() -> None:
     """Test JWTValidationMiddleware init with blocked JWKS URI."""
     with pytest.raises(ValueError, match=r"JWKS URI https://bad.com/jwks not in whitelist"):
@@ -112,31 +272,41 @@ def test_is_uri_allowed() -> None:
     assert not middleware._is_uri_allowed("https://evil.net/keys")
 
 
-@pytest.mark.asyncio
-async def test_dispatch_external_strategy() -> None:
-    """Test dispatch with external strategy."""
-    middleware = JWTValidationMiddleware(MagicMock(), strategy="external")
-    request = MagicMock()
-    call_next = AsyncMock(return_value=MagicMock())
+async def test_call_external_strategy() -> None:
+    """Test the middleware passes requests through with external strategy."""
+    app = AsyncMock()
+    middleware = JWTValidationMiddleware(app, strategy="external")
+    scope = make_scope()
+    receive, send = AsyncMock(), AsyncMock()
+
+    await middleware(scope, receive, send)
+    app.assert_awaited_once_with(scope, receive, send)
+
 
-    response = await middleware.dispatch(request, call_next)
-    call_next.assert_called_once_with(request)
-    assert response is not None
+async def test_call_skips_unauthenticated_paths() -> None:
+    """Test the middleware skips validation for health checks and OAuth metadata."""
+    app = AsyncMock()
+    middleware = JWTValidationMiddleware(app, strategy="local", jwks_uri="https://example.com/jwks")
+    receive, send = AsyncMock(), AsyncMock()
 
+    for path in ["/health", "/.well-known/oauth-protected-resource", "/login"]:
+        scope = {**make_scope(), "path": path}
+        await middleware(scope, receive, send)
+        app.assert_awaited_with(scope, receive, send)
+    send.assert_not_called()
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 @patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
 @patch("mcp_app.middlewares.jwt_validation.jwt.decode")
-async def test_dispatch_local_strategy(
+async def test_call_local_strategy(
     mock_decode: MagicMock, mock_pyjwk: MagicMock, mock_get_header: MagicMock
 ) -> None:
-    """Test dispatch with local strategy."""
+    """Test the middleware validates and forwards the request with local strategy."""
     mock_get_header.return_value = {"kid": "key1"}
 
-    middleware = JWTValidationMiddleware(
-        MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
-    )
+    app = AsyncMock()
+    middleware = JWTValidationMiddleware(app, strategy="local", jwks_uri="https://example.com/jwks")
     assert middleware.jwks is not None
     middleware.jwks.keys = {
         "key1": {
@@ -148,79 +318,84 @@ async def test_dispatch_local_strategy(
             ),
         }
     }
-
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
-    request.headers.__dict__["_list"] = []
-
-    call_next = AsyncMock(return_value=MagicMock())
+    middleware.jwks.last_updated = time.time()
 
     mock_key = MagicMock()
     mock_pyjwk.return_value.key = mock_key
     mock_decode.return_value = {"user": "test"}
 
-    response = await middleware.dispatch(request, call_next)
-    call_next.assert_called_once_with(request)
-    assert response is not None
+    scope = make_scope(headers={"Authorization": "Bearer token"})
+    await middleware(scope, AsyncMock(), AsyncMock())
 
+    app.assert_awaited_once()
+    # The validated JWT is visible to the downstream app as request state
+    assert app.await_args is not None
+    state = app.await_args.args[0]["state"]
+    assert state == {"validated_jwt": "token", "jwt_payload": {"user": "test"}}
 
-@pytest.mark.asyncio
-async def test_dispatch_rate_limit_exceeded() -> None:
-    """Test dispatch with rate limit exceeded."""
-    middleware = JWTValidationMiddleware(
-        MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
-    )
 
-    request = MagicMock()
-    request.client = MagicMock(host="192.168.1.1")
+async def test_call_rate_limit_exceeded() -> None:
+    """Test the middleware responds 429 when the rate limit is exceeded."""
+    app = AsyncMock()
+    middleware = JWTValidationMiddleware(app, strategy="local", jwks_uri="https://example.com/jwks")
+
     # Set rate limit to exceed threshold
     middleware.rate_limit["192.168.1.1"] = 11  # > MAX_RATE_LIMIT_REQUESTS (10)
 
-    call_next = AsyncMock()
+    send = AsyncMock()
+    await middleware(make_scope(client="192.168.1.1"), AsyncMock(), send)
 
-    response = await middleware.dispatch(request, call_next)
+    start_message = send.await_args_list[0].args[0]
+    assert start_message["status"] == HTTP_429_TOO_MANY_REQUESTS
+    app.assert_not_called()
 
-    assert response.status_code == HTTP_429_TOO_MANY_REQUESTS
-    call_next.assert_not_called()
 
-
-@pytest.mark.asyncio
-async def test_dispatch_options_request() -> None:
-    """Test dispatch with OPTIONS request (CORS preflight)."""
+async def test_validate_local_rate_limit_logs_once(caplog: pytest.LogCaptureFixture) -> None:
+    """Test only the first rate limit rejection per IP and window is logged."""
     middleware = JWTValidationMiddleware(
         MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
     )
+    middleware.rate_limit["192.168.1.1"] = 11  # > MAX_RATE_LIMIT_REQUESTS (10)
 
-    request = MagicMock()
-    request.method = "OPTIONS"
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc_info:
+            await middleware._validate_local(make_scope(client="192.168.1.1"))
+        assert exc_info.value.status_code == HTTP_429_TOO_MANY_REQUESTS
 
-    call_next = AsyncMock()
-    call_next.return_value = MagicMock()
+    assert [r.message for r in caplog.records if "Rate limit" in r.message] == [
+        "Rate limit exceeded from 192.168.1.1 for GET /mcp; "
+        "further rejections this window are not logged"
+    ]
 
-    response = await middleware.dispatch(request, call_next)
 
-    call_next.assert_called_once_with(request)
-    assert response is not None
+async def test_validate_local_rate_limit_window_resets() -> None:
+    """Test per-IP request counts start over once the rate limit window has passed."""
+    middleware = JWTValidationMiddleware(
+        MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
+    )
+    middleware.rate_limit = {"192.168.1.1": 11, "10.0.0.1": 3}
+    middleware._rate_limit_window_start -= RATE_LIMIT_WINDOW
+
+    # Past the rate limit, the request fails on the missing Authorization header instead
+    with pytest.raises(HTTPException) as exc_info:
+        await middleware._validate_local(make_scope(client="192.168.1.1"))
+    assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
+    assert middleware.rate_limit == {"192.168.1.1": 1}
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
-async def test_validate_local_no_jwks(mock_get_header: MagicMock) -> None:
-    """Test _validate_local with no JWKS configured."""
-    mock_get_header.return_value = {"kid": "key1"}
+async def test_call_options_request() -> None:
+    """Test the middleware skips validation for OPTIONS requests (CORS preflight)."""
+    app = AsyncMock()
+    middleware = JWTValidationMiddleware(app, strategy="local", jwks_uri="https://example.com/jwks")
+    scope = make_scope("OPTIONS")
+    receive, send = AsyncMock(), AsyncMock()
 
-    middleware = JWTValidationMiddleware(MagicMock(), strategy="local")  # No jwks_uri
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    await middleware(scope, receive, send)
 
-    with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
-    assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
-    assert "JWKS not configured" in str(exc_info.value.detail)
+    app.assert_awaited_once_with(scope, receive, send)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 async def test_validate_local_invalid_header(mock_get_header: MagicMock) -> None:
     """Test _validate_local with invalid JWT header."""
     mock_get_header.side_effect = jwt.PyJWTError("Invalid header")
@@ -228,17 +403,15 @@ async def test_validate_local_invalid_header(mock_get_header: MagicMock) -> None
     middleware = JWTValidationMiddleware(
         MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
     )
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Invalid JWT header" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 async def test_validate_local_key_not_found(mock_get_header: MagicMock) -> None:
     """Test _validate_local with key not found."""
     mock_get_header.return_value = {"kid": "key1"}
@@ -248,18 +421,17 @@ async def test_validate_local_key_not_found(mock_get_header: MagicMock) -> None:
     )
     assert middleware.jwks is not None
     middleware.jwks.keys = {}  # No key
+    middleware.jwks.last_updated = time.time()
 
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Key not found in JWKS" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 @patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
 async def test_validate_local_invalid_jwk(
     mock_pyjwk: MagicMock, mock_get_header: MagicMock
@@ -273,18 +445,17 @@ async def test_validate_local_invalid_jwk(
     )
     assert middleware.jwks is not None
     middleware.jwks.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    middleware.jwks.last_updated = time.time()
 
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Invalid JWK" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 @patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
 @patch("mcp_app.middlewares.jwt_validation.jwt.decode")
 async def test_validate_local_expired_token(
@@ -301,18 +472,17 @@ async def test_validate_local_expired_token(
     )
     assert middleware.jwks is not None
     middleware.jwks.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    middleware.jwks.last_updated = time.time()
 
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "JWT expired" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 @patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
 @patch("mcp_app.middlewares.jwt_validation.jwt.decode")
 async def test_validate_local_invalid_token(
@@ -329,18 +499,17 @@ async def test_validate_local_invalid_token(
     )
     assert middleware.jwks is not None
     middleware.jwks.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    middleware.jwks.last_updated = time.time()
 
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Invalid JWT" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 @patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
 @patch("mcp_app.middlewares.jwt_validation.jwt.decode")
 async def test_validate_local_condition_fail(
@@ -360,50 +529,45 @@ async def test_validate_local_condition_fail(
     )
     assert middleware.jwks is not None
     middleware.jwks.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    middleware.jwks.last_updated = time.time()
 
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "does not meet conditions" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 async def test_validate_local_missing_auth_header(mock_get_header: MagicMock) -> None:  # noqa: ARG001
     """Test _validate_local with missing auth header."""
     middleware = JWTValidationMiddleware(
         MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
     )
-    request = MagicMock()
-    request.headers.get.return_value = None
+    scope = make_scope()
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Invalid Authorization header" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 async def test_validate_local_invalid_auth_header(mock_get_header: MagicMock) -> None:  # noqa: ARG001
     """Test _validate_local with invalid auth header."""
     middleware = JWTValidationMiddleware(
         MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
     )
-    request = MagicMock()
-    request.headers.get.return_value = "Invalid"
+    scope = make_scope(headers={"Authorization": "Invalid"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Invalid Authorization header" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 async def test_validate_local_missing_kid(mock_get_header: MagicMock) -> None:
     """Test _validate_local with missing kid."""
     mock_get_header.return_value = {}
@@ -411,17 +575,15 @@ async def test_validate_local_missing_kid(mock_get_header: MagicMock) -> None:
     middleware = JWTValidationMiddleware(
         MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
     )
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
     with pytest.raises(HTTPException) as exc_info:
-        await middleware._validate_local(request)
+        await middleware._validate_local(scope)
     assert exc_info.value.status_code == HTTP_401_UNAUTHORIZED
     assert "Invalid JWT header" in str(exc_info.value.detail)
 
 
-@pytest.mark.asyncio
-@patch("mcp_app.middlewares.jwt_validation.jwt.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
 @patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
 @patch("mcp_app.middlewares.jwt_validation.jwt.decode")
 async def test_validate_local_success(
@@ -441,16 +603,53 @@ async def test_validate_local_success(
     )
     assert middleware.jwks is not None
     middleware.jwks.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    middleware.jwks.last_updated = time.time()
 
-    request = MagicMock()
-    request.headers.get.return_value = "Bearer token"
-    request.headers.__dict__["_list"] = []
+    scope = make_scope(headers={"Authorization": "Bearer token"})
 
-    await middleware._validate_local(request)
+    await middleware._validate_local(scope)
 
     # jwt.decode is called once in _validate_local
     assert mock_decode.call_count == 1
-    assert len(request.headers.__dict__["_list"]) == 1
+    assert mock_decode.call_args.args[0] == "token"
+    assert scope["state"]["validated_jwt"] == "token"
+    assert scope["state"]["jwt_payload"] == {"user": "test"}
+    # Request headers are left untouched
+    assert scope["headers"] == [(b"authorization", b"Bearer token")]
+
+
+@patch("mcp_app.middlewares.jwt_validation.get_unverified_header")
+@patch("mcp_app.middlewares.jwt_validation.jwt.PyJWK")
+@patch("mcp_app.middlewares.jwt_validation.jwt.decode")
+async def test_validate_local_cached_token_skips_decode(
+    mock_decode: MagicMock,
+    mock_pyjwk: MagicMock,  # noqa: ARG001
+    mock_get_header: MagicMock,
+) -> None:
+    """Test _validate_local verifies a token once and reuses it until it expires."""
+    mock_get_header.return_value = {"kid": "key1"}
+    payload = {"user": "test", "exp": time.time() + 60}
+    mock_decode.return_value = dict(payload)
+
+    middleware = JWTValidationMiddleware(
+        MagicMock(), strategy="local", jwks_uri="https://example.com/jwks"
+    )
+    assert middleware.jwks is not None
+    middleware.jwks.keys = {"key1": {"kid": "key1", "kty": "RSA"}}
+    middleware.jwks.last_updated = time.time()
+
+    for _ in range(2):
+        scope = make_scope(headers={"Authorization": "Bearer token"})
+        await middleware._validate_local(scope)
+        assert scope["state"]["jwt_payload"] == payload
+        # Changes made downstream do not leak into later requests
+        scope["state"]["jwt_payload"]["user"] = "changed"
+    assert mock_decode.call_count == 1
+
+    # An expired entry is verified again
+    middleware._verified_tokens["token"] = (time.time() - 1, payload)
+    await middleware._validate_local(make_scope(headers={"Authorization": "Bearer token"}))
+    assert mock_decode.call_count == 2  # noqa: PLR2004
 
 
 def test_check_condition_simple() -> None:
@@ -1,5 +1,6 @@
 """Tests for the main MCP application."""
 
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -108,6 +109,7 @@ def test_main_http_function(mock_uvicorn_run: MagicMock) -> None:
     assert isinstance(args[0], FastAPI)
     assert kwargs["host"] == "0.0.0.0"  # noqa: S104  # From config.toml
     assert kwargs["port"] == PORT_DEFAULT
+    assert kwargs["http"] == "httptools"
 
 
 @patch("mcp_app.main.app_config._config", None)
@@ -143,7 +145,7 @@ def test_oauth_authorization_server_with_config() -> None:
     mock_manager = MagicMock()
     mock_manager.handle_oauth_authorization_server = AsyncMock(return_value={"test": "data"})
     test_app_config = AppConfig()
-    test_app_config._config = MagicMock()  # Mock config
+    test_app_config._config = MagicMock(oauth_protected_resource=None)  # Mock config
     test_mcp_server = MCPServer()
     test_fastapi_app = FastAPIApp(test_app_config.config, test_mcp_server.mcp)
     test_fastapi_app.handlers_manager = mock_manager  # Set mock manager
@@ -159,7 +161,7 @@ def test_oauth_protected_resource_with_config() -> None:
     mock_manager = MagicMock()
     mock_manager.handle_oauth_protected_resources = AsyncMock(return_value={"test": "data"})
     test_app_config = AppConfig()
-    test_app_config._config = MagicMock()  # Mock config
+    test_app_config._config = MagicMock(oauth_protected_resource=None)  # Mock config
     test_mcp_server = MCPServer()
     test_fastapi_app = FastAPIApp(test_app_config.config, test_mcp_server.mcp)
     test_fastapi_app.handlers_manager = mock_manager  # Set mock manager
@@ -184,7 +186,7 @@ def test_login_no_config() -> None:
 
 def test_login_incomplete_config() -> None:
     """Test login endpoint when config is incomplete."""
-    mock_config = MagicMock()
+    mock_config = MagicMock(oauth_protected_resource=None)
     mock_config.auth = None
     mock_config.middleware = None
     test_app_config = AppConfig()
@@ -216,7 +218,7 @@ def test_login_success() -> None:
     mock_middleware_config = MagicMock()
     mock_middleware_config.jwt = mock_jwt
 
-    mock_config = MagicMock()
+    mock_config = MagicMock(oauth_protected_resource=None)
     mock_config.auth = mock_auth
     mock_config.middleware = mock_middleware_config
 
@@ -248,7 +250,7 @@ def test_callback_no_config() -> None:
 
 def test_callback_incomplete_config() -> None:
     """Test callback endpoint when config is incomplete."""
-    mock_config = MagicMock()
+    mock_config = MagicMock(oauth_protected_resource=None)
     mock_config.auth = None
     mock_config.middleware = None
     test_app_config = AppConfig()
@@ -282,7 +284,7 @@ def test_callback_success(mock_client_class: MagicMock) -> None:
     mock_middleware_config = MagicMock()
     mock_middleware_config.jwt = mock_jwt_config
 
-    mock_config = MagicMock()
+    mock_config = MagicMock(oauth_protected_resource=None)
     mock_config.auth = mock_auth
     mock_config.middleware = mock_middleware_config
 
@@ -294,7 +296,7 @@ def test_callback_success(mock_client_class: MagicMock) -> None:
     # Mock httpx response
     mock_response = MagicMock()
     mock_response.status_code = 200
-    mock_response.json.return_value = {"access_token": "test_token"}
+    mock_response.content = b'{"access_token": "test_token"}'
 
     mock_client_instance = MagicMock()
     mock_client_instance.post = AsyncMock(return_value=mock_response)
@@ -328,7 +330,7 @@ def test_callback_token_exchange_failure(mock_client_class: MagicMock) -> None:
     mock_middleware_config = MagicMock()
     mock_middleware_config.jwt = mock_jwt_config
 
-    mock_config = MagicMock()
+    mock_config = MagicMock(oauth_protected_resource=None)
     mock_config.auth = mock_auth
     mock_config.middleware = mock_middleware_config
 
@@ -352,6 +354,57 @@ def test_callback_token_exchange_failure(mock_client_class: MagicMock) -> None:
     assert response.json() == {"error": "Failed to get token", "details": "Invalid code"}
 
 
+@patch("httpx.AsyncClient")
+def test_callback_reuses_lifespan_client(mock_client_class: MagicMock) -> None:
+    """Test callback endpoint reuses the client opened by the app lifespan."""
+    mock_local = MagicMock()
+    mock_local.issuer = "https://test.auth0.com/"
+
+    mock_config = MagicMock(oauth_protected_resource=None)
+    mock_config.middleware.jwt.validation.local = mock_local
+
+    test_mcp_server = MCPServer()
+    test_fastapi_app = FastAPIApp(mock_config, test_mcp_server.mcp)
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.content = b'{"access_token": "test_token"}'
+
+    mock_client_instance = MagicMock()
+    mock_client_instance.post = AsyncMock(return_value=mock_response)
+    mock_client_class.return_value.__aenter__.return_value = mock_client_instance
+
+    with TestClient(test_fastapi_app.app) as client:
+        client.get("/callback?code=first")
+        client.get("/callback?code=second")
+
+    mock_client_class.assert_called_once()
+    assert mock_client_instance.post.await_count == 2  # noqa: PLR2004
+
+
+async def test_exchange_code_coalesces_same_code() -> None:
+    """Test concurrent token exchanges for the same code share a single POST."""
+    test_fastapi_app = FastAPIApp(None, MCPServer().mcp)
+    mock_response = MagicMock(status_code=200)
+
+    async def slow_post(*_: object, **__: object) -> MagicMock:
+        await asyncio.sleep(0.01)
+        return mock_response
+
+    test_fastapi_app._http_client = MagicMock(post=AsyncMock(side_effect=slow_post))
+    url = "https://test.auth0.com/oauth/token"
+
+    first, second, other = await asyncio.gather(
+        test_fastapi_app._exchange_code("same", url, {}),
+        test_fastapi_app._exchange_code("same", url, {}),
+        test_fastapi_app._exchange_code("other", url, {}),
+    )
+
+    assert first is second is other is mock_response
+    assert test_fastapi_app._http_client.post.await_count == 2  # noqa: PLR2004
+    assert test_fastapi_app._token_exchanges == {}
+
+
 def test_callback_oauth_error() -> None:
     """Test callback endpoint when OAuth returns error."""
     test_app_config = AppConfig()
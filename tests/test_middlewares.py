@@ -5,14 +5,60 @@ import logging
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from starlette.types import Message, Receive, Scope, Send
 
-from mcp_app.middlewares.access_logs import AccessLogsMiddleware
+from mcp_app.middlewares.access_logs import AccessLogsMiddleware, logger, queued_access_logs
+from mcp_app.middlewares.conditions import UnsupportedConditionError, compile_condition
+from mcp_app.middlewares.cors import CORSMiddleware
+from mcp_app.middlewares.health import HEALTH_CHECK_BODY, HealthCheckMiddleware
 
 # Constants for tests
 DEFAULT_MAX_BODY_SIZE = 1024
 HTTP_OK_STATUS = 200
 
 
+def make_scope(method: str, headers: dict[str, str], path: str = "/") -> Scope:
+    """Build a minimal HTTP scope for middleware tests."""
+    return {
+        "type": "http",
+        "method": method,
+        "scheme": "http",
+        "server": ("example.com", 80),
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+    }
+
+
+def make_receive(body: bytes) -> Receive:
+    """Build a receive callable that returns the given body in one message."""
+
+    async def receive() -> Message:
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return receive
+
+
+async def noop_send(message: Message) -> None:
+    """Discard ASGI messages sent by the middleware."""
+
+
+class EchoApp:
+    """ASGI app that records the request body it receives and responds with 200."""
+
+    def __init__(self) -> None:
+        """Initialize with no received body."""
+        self.body: bytes | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Read the request body and send an empty 200 response."""
+        _ = scope
+        self.body = (await receive())["body"]
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
 @pytest.fixture
 def caplog(caplog: pytest.LogCaptureFixture) -> pytest.LogCaptureFixture:
     """Fixture to capture log messages."""
@@ -30,6 +76,15 @@ def test_access_logs_middleware_init() -> None:
     assert middleware.redacted_headers == expected_redacted
 
 
+def test_access_logs_middleware_init_normalizes_case() -> None:
+    """Test configured header names are lower-cased to match incoming headers."""
+    middleware = AccessLogsMiddleware(
+        MagicMock(), excluded_headers=["X-Exclude"], redacted_headers=["X-Secret"]
+    )
+    assert middleware.excluded_headers == {"x-exclude"}
+    assert "x-secret" in middleware.redacted_headers
+
+
 def test_access_logs_middleware_init_defaults() -> None:
     """Test AccessLogsMiddleware initialization with defaults."""
     app = MagicMock()
@@ -41,34 +96,27 @@ def test_access_logs_middleware_init_defaults() -> None:
     assert middleware.max_body_size == DEFAULT_MAX_BODY_SIZE
 
 
-@pytest.mark.asyncio
-async def test_dispatch_logs_request_and_response(caplog: pytest.LogCaptureFixture) -> None:
-    """Test dispatch logs request and response."""
-    app = MagicMock()
+async def test_call_logs_request_and_response(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the middleware logs request and response and passes the body through."""
+    app = EchoApp()
     middleware = AccessLogsMiddleware(
         app, excluded_headers=["exclude"], redacted_headers=["redact"]
     )
 
-    request = MagicMock()
-    request.method = "GET"
-    request.url = "http://example.com"
-    request.headers = {
-        "exclude": "value",
-        "redact": "secret",
-        "keep": "value",
-        "content-length": "9",
-    }
-    request.body = AsyncMock(return_value=b"test body")
-
-    response = MagicMock()
-    response.status_code = 200
-
-    call_next = AsyncMock(return_value=response)
+    scope = make_scope(
+        "GET",
+        {
+            "exclude": "value",
+            "redact": "secret",
+            "keep": "value",
+            "content-length": "9",
+        },
+    )
 
-    result = await middleware.dispatch(request, call_next)
+    await middleware(scope, make_receive(b"test body"), noop_send)
 
-    assert result == response
-    call_next.assert_called_once_with(request)
+    # The app still sees the body that was read for logging
+    assert app.body == b"test body"
 
     # Check JSON logs
     log_messages = [record.message for record in caplog.records]
@@ -83,7 +131,7 @@ async def test_dispatch_logs_request_and_response(caplog: pytest.LogCaptureFixtu
 
     assert request_log is not None
     assert request_log["method"] == "GET"
-    assert request_log["url"] == "http://example.com"
+    assert request_log["url"] == "http://example.com/"
     assert request_log["headers"] == {
         "redact": "[REDACTED]",
         "keep": "value",
@@ -96,27 +144,17 @@ async def test_dispatch_logs_request_and_response(caplog: pytest.LogCaptureFixtu
     assert "duration" in response_log
 
 
-@pytest.mark.asyncio
 async def test_access_logs_middleware_invalid_body(caplog: pytest.LogCaptureFixture) -> None:
     """Test AccessLogsMiddleware with invalid body content."""
-    app = MagicMock()
+    app = EchoApp()
     middleware = AccessLogsMiddleware(app)
 
-    request = MagicMock()
-    request.method = "POST"
-    request.url = "http://example.com"
-    request.headers = {"content-length": "invalid"}  # Invalid content-length
-    request.body = AsyncMock(return_value=b"test body")
-
-    response = MagicMock()
-    response.status_code = 200
+    # Invalid content-length
+    scope = make_scope("POST", {"content-length": "invalid"})
 
-    call_next = AsyncMock(return_value=response)
+    await middleware(scope, make_receive(b"test body"), noop_send)
 
-    result = await middleware.dispatch(request, call_next)
-
-    assert result == response
-    call_next.assert_called_once_with(request)
+    assert app.body == b"test body"
 
     # Check JSON logs
     log_messages = [record.message for record in caplog.records]
@@ -129,3 +167,163 @@ async def test_access_logs_middleware_invalid_body(caplog: pytest.LogCaptureFixt
 
     assert request_log is not None
     assert request_log["body"] == "[BINARY OR INVALID BODY]"
+
+
+async def test_access_logs_middleware_chunked_body(caplog: pytest.LogCaptureFixture) -> None:
+    """Test AccessLogsMiddleware joins a body sent in several messages and replays them."""
+    chunks: list[Message] = [
+        {"type": "http.request", "body": b"test ", "more_body": True},
+        {"type": "http.request", "body": b"body", "more_body": False},
+    ]
+    received: list[Message] = []
+
+    async def receive() -> Message:
+        return chunks.pop(0)
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        _ = scope, send
+        received.extend([await receive(), await receive()])
+
+    middleware = AccessLogsMiddleware(app)
+    await middleware(make_scope("POST", {"content-length": "9"}), receive, noop_send)
+
+    assert b"".join(message["body"] for message in received) == b"test body"
+    request_log = json.loads(caplog.records[0].message)
+    assert request_log["body"] == "test body"
+
+
+async def test_access_logs_middleware_disabled_logger(caplog: pytest.LogCaptureFixture) -> None:
+    """Test AccessLogsMiddleware passes requests straight through when INFO is disabled."""
+    caplog.set_level(logging.WARNING, logger="mcp_app.middlewares.access_logs")
+    app = AsyncMock()
+    middleware = AccessLogsMiddleware(app)
+    scope = make_scope("POST", {"content-length": "9"})
+    receive = make_receive(b"test body")
+
+    await middleware(scope, receive, noop_send)
+
+    app.assert_awaited_once_with(scope, receive, noop_send)
+    assert caplog.records == []
+
+
+async def test_access_logs_middleware_silent_paths(caplog: pytest.LogCaptureFixture) -> None:
+    """Test AccessLogsMiddleware does not log silent paths."""
+    caplog.set_level(logging.INFO, logger="mcp_app.middlewares.access_logs")
+    app = AsyncMock()
+    middleware = AccessLogsMiddleware(app, silent_paths=["/ping"])
+    scope = make_scope("GET", {}, path="/ping")
+    receive = make_receive(b"")
+
+    await middleware(scope, receive, noop_send)
+
+    app.assert_awaited_once_with(scope, receive, noop_send)
+    assert caplog.records == []
+    assert AccessLogsMiddleware(app).silent_paths == {"/health"}
+
+
+def test_queued_access_logs_forwards_to_root_handlers() -> None:
+    """Test queued_access_logs hands records to the root handlers from a listener thread."""
+    handler = MagicMock(level=logging.NOTSET)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        with queued_access_logs():
+            assert logger.propagate is False
+            logger.warning("queued")
+        # Stopping the listener flushes the queue
+        handler.handle.assert_called_once()
+        assert handler.handle.call_args.args[0].getMessage() == "queued"
+        assert logger.propagate is True
+    finally:
+        root.removeHandler(handler)
+
+
+async def test_health_check_middleware_short_circuits() -> None:
+    """Test HealthCheckMiddleware answers health probes without calling the app."""
+    app = AsyncMock()
+    middleware = HealthCheckMiddleware(app)
+    send = AsyncMock()
+
+    await middleware(make_scope("GET", {}, path="/health"), make_receive(b""), send)
+
+    app.assert_not_called()
+    start, body = (call.args[0] for call in send.await_args_list)
+    assert start["status"] == HTTP_OK_STATUS
+    assert body["body"] == HEALTH_CHECK_BODY
+
+
+async def test_health_check_middleware_passes_other_paths() -> None:
+    """Test HealthCheckMiddleware forwards any other request to the app."""
+    app = AsyncMock()
+    middleware = HealthCheckMiddleware(app)
+    scope = make_scope("GET", {}, path="/mcp")
+    receive = make_receive(b"")
+
+    await middleware(scope, receive, noop_send)
+
+    app.assert_awaited_once_with(scope, receive, noop_send)
+
+
+def test_cors_middleware_is_allowed_origin() -> None:
+    """Test CORSMiddleware matches configured origins and the origin regex."""
+    middleware = CORSMiddleware(
+        MagicMock(),
+        allow_origins=["https://app.example.com"],
+        allow_origin_regex=r"https://.*\.example\.org",
+    )
+    assert middleware.is_allowed_origin("https://app.example.com")
+    assert middleware.is_allowed_origin("https://api.example.org")
+    assert not middleware.is_allowed_origin("https://evil.com")
+    assert CORSMiddleware(MagicMock(), allow_origins=["*"]).is_allowed_origin("https://evil.com")
+
+
+def test_compile_condition_operators() -> None:
+    """Test compiled conditions support logical operators, comparisons and macros."""
+    payload = {
+        "user": "test",
+        "email": "test@example.com",
+        "roles": ["admin", "dev"],
+        "level": 3,
+        "org": {"name": "acme"},
+    }
+    passing = [
+        "payload.user == 'test' and payload.level >= 2",
+        "payload.user == 'other' or 'dev' in payload.roles",
+        "not payload.user != 'test'",
+        "'ops' not in payload.roles",
+        "payload.org.name == 'acme' and payload_['org']['name'].startswith('ac')",
+        "has(payload.email) and not has(payload.missing)",
+        "payload.roles.exists(r, r == 'admin')",
+        "payload.roles.all(r, r.endswith('n') or r == 'dev')",
+        "size(payload.roles) == 2 and payload.roles[0] == 'admin'",
+        "payload.level in [1, 2, 3] and true",
+        'has(payload.email) && payload.email.endswith("@example.com")',
+        "!(payload.user == 'x') || payload.user == '&& !'",
+    ]
+    failing = [
+        "payload.user",  # not a boolean
+        "payload.user and true",  # non-boolean operand
+        "'x' in payload.user",  # in needs a list or map
+        "payload.missing.name == 'acme'",  # field of a missing claim
+        "payload.level.endswith('3')",  # endswith needs a string
+    ]
+    for condition in passing:
+        assert compile_condition(condition)(payload) is True, condition
+    for condition in failing:
+        assert compile_condition(condition)(payload) is False, condition
+
+
+def test_compile_condition_rejects_unsupported_syntax() -> None:
+    """Test conditions outside the supported subset are rejected at compile time."""
+    for condition in [
+        "",
+        "payload.user ==",
+        "open('/etc/passwd')",
+        "payload.__class__ == 'dict'",
+        "payload.user.upper() == 'TEST'",
+        "[r for r in payload.roles]",
+        "payload.roles.exists(payload, true)",
+        "lambda: True",
+    ]:
+        with pytest.raises(UnsupportedConditionError):
+            compile_condition(condition)
@@ -4,7 +4,13 @@ from unittest.mock import MagicMock
 
 import pytest
 
-from mcp_app.context import jwt_context_config, jwt_payload, set_exposed_claims, set_jwt_context
+from mcp_app.context import (
+    JWTState,
+    jwt_context_config,
+    jwt_state,
+    set_exposed_claims,
+    set_jwt_context,
+)
 from mcp_app.mcp_components.router import register_tools
 from mcp_app.mcp_components.tools.hello_world import hello_world
 from mcp_app.mcp_components.tools.whoami import whoami
@@ -16,16 +22,18 @@ def test_register_tools() -> None:
     """Test that register_tools registers the tools."""
     mcp = MagicMock()
     register_tools(mcp, "stdio")
-    # Check that tool decorator was called twice and resource once
-    assert mcp.tool.call_count == NUM_TOOLS
+    # Check that both tools were added
+    assert mcp.add_tool.call_count == NUM_TOOLS
+    mcp.add_tool.assert_any_call(hello_world)
+    mcp.add_tool.assert_any_call(whoami)
 
 
 def test_register_tools_http_mode() -> None:
     """Test that register_tools in http mode does not register resources."""
     mcp = MagicMock()
     register_tools(mcp, "http")
-    # Check that tool decorator was called twice and resource not called
-    assert mcp.tool.call_count == NUM_TOOLS
+    # Check that both tools were added and resources were not
+    assert mcp.add_tool.call_count == NUM_TOOLS
     assert mcp.resource.call_count == 0
 
 
@@ -38,7 +46,7 @@ def test_hello_world_tool() -> None:
 
 def test_hello_world_tool_no_jwt() -> None:
     """Test the hello_world tool function without JWT."""
-    jwt_payload.set(None)  # Simulate no JWT
+    jwt_state.set(None)  # Simulate no JWT
     result = hello_world("Test")
     assert result == "Hello, Test! 👋"
 
@@ -50,9 +58,20 @@ def test_hello_world_tool_insufficient_permissions() -> None:
         hello_world("Test")
 
 
+def test_jwt_state_permission_set() -> None:
+    """Test JWTState builds its permission set from a list or space-separated string."""
+    assert JWTState(payload={"permissions": ["tool:user", 1]}).permissions == {"tool:user"}
+    assert JWTState(payload={"permissions": "tool:user tool:admin"}).permissions == {
+        "tool:user",
+        "tool:admin",
+    }
+    assert JWTState(payload={"sub": "user123"}).permissions == frozenset()
+    assert JWTState().permissions == frozenset()
+
+
 def test_whoami_tool_no_jwt() -> None:
     """Test the whoami tool with no JWT."""
-    jwt_payload.set(None)  # Simulate no JWT
+    jwt_state.set(None)  # Simulate no JWT
     result = whoami()
     assert result == "No JWT available (running in stdio mode or invalid token)"
 
@@ -60,7 +79,7 @@ def test_whoami_tool_no_jwt() -> None:
 def test_whoami_tool_with_jwt() -> None:
     """Test the whoami tool with JWT."""
     test_payload = {"sub": "user123", "roles": ["admin"], "permissions": ["tool:admin"]}
-    jwt_payload.set(test_payload)  # Simulate decoded payload
+    jwt_state.set(JWTState(payload=test_payload))  # Simulate decoded payload
     result = whoami()
     assert result == test_payload
 
@@ -68,7 +87,7 @@ def test_whoami_tool_with_jwt() -> None:
 def test_whoami_tool_insufficient_permissions() -> None:
     """Test whoami tool with JWT but insufficient permissions."""
     test_payload = {"sub": "user123", "roles": ["admin"], "permissions": ["tool:user"]}
-    jwt_payload.set(test_payload)  # No tool:admin scope
+    jwt_state.set(JWTState(payload=test_payload))  # No tool:admin scope
     with pytest.raises(
         PermissionError, match="Insufficient permissions: tool:admin scope required"
     ):